@@ -0,0 +1,160 @@
+from typing import Any, Awaitable, Callable
+from collections import OrderedDict
+from dataclasses import dataclass
+import asyncio
+import time
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+    expires_at: float
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.stored_at
+
+    @property
+    def stale(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+@dataclass
+class Aged:
+    """A fetched value that is already age seconds old, e.g. from another worker's cache."""
+    value: Any
+    age: float
+
+
+class ResponseCache:
+    """In-process TTL cache for upstream responses.
+
+    Entries are keyed on the endpoint plus the normalized request parameters,
+    evicted least-recently-used once max_entries is reached, and concurrent
+    misses for the same key share a single upstream fetch.
+
+    Expired entries are kept for up to max_stale seconds: within that window
+    they are served immediately (marked stale) while a background fetch
+    revalidates them, and a failed fetch leaves the last good value in place.
+    """
+
+    def __init__(self, max_entries: int = 256, default_ttl: float = 15.0,
+                 ttls: dict[str, float] | None = None, max_stale: float = 0.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self.max_stale = max_stale
+        self._entries: OrderedDict[tuple, CacheEntry] = OrderedDict()
+        self._inflight: dict[tuple, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.stale_hits = 0
+        self.refresh_failures = 0
+
+    @staticmethod
+    def make_key(endpoint: str, params: dict[str, Any]) -> tuple:
+        """Normalize request params so 1 and "1" map to the same entry."""
+        return (endpoint, tuple(sorted((str(k), str(v)) for k, v in params.items())))
+
+    def ttl_for(self, endpoint: str) -> float:
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    async def get_or_fetch(self, endpoint: str, params: dict[str, Any],
+                           fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value, or fetch it once for all concurrent callers."""
+        entry = await self.get_entry(endpoint, params, fetch)
+        return entry.value if entry is not None else None
+
+    async def get_entry(self, endpoint: str, params: dict[str, Any],
+                        fetch: Callable[[], Awaitable[Any]]) -> CacheEntry | None:
+        """Like get_or_fetch, but return the entry so callers can see its age."""
+        key = self.make_key(endpoint, params)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if not entry.stale:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if self._within_stale_window(entry):
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                self._start_fetch(key, endpoint, fetch)
+                return entry
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._start_fetch(key, endpoint, fetch)
+        # Shield so one cancelled caller does not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def refresh(self, endpoint: str, params: dict[str, Any],
+                      fetch: Callable[[], Awaitable[Any]]) -> CacheEntry | None:
+        """Fetch and store a value regardless of the current entry's freshness."""
+        key = self.make_key(endpoint, params)
+        return await asyncio.shield(self._start_fetch(key, endpoint, fetch))
+
+    def _within_stale_window(self, entry: CacheEntry) -> bool:
+        return time.monotonic() - entry.expires_at < self.max_stale
+
+    def _start_fetch(self, key: tuple, endpoint: str,
+                     fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, endpoint, fetch))
+            task.add_done_callback(self._fetch_done)
+            self._inflight[key] = task
+        return task
+
+    def _fetch_done(self, task: asyncio.Task) -> None:
+        # Background refreshes have no awaiter; count their errors instead of leaving them unretrieved
+        if not task.cancelled() and task.exception() is not None:
+            self.refresh_failures += 1
+
+    async def _fetch(self, key: tuple, endpoint: str,
+                     fetch: Callable[[], Awaitable[Any]]) -> CacheEntry | None:
+        try:
+            value = await fetch()
+            age = 0.0
+            if isinstance(value, Aged):
+                value, age = value.value, value.age
+            if value is not None:
+                return self._store(key, endpoint, value, age)
+            # Failed fetches are never cached; fall back to the last good value
+            self.refresh_failures += 1
+            entry = self._entries.get(key)
+            if entry is not None and self._within_stale_window(entry):
+                return entry
+            return None
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key: tuple, endpoint: str, value: Any, age: float = 0.0) -> CacheEntry:
+        stored_at = time.monotonic() - age
+        entry = CacheEntry(value, stored_at, stored_at + self.ttl_for(endpoint))
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "stale_hits": self.stale_hits,
+            "refresh_failures": self.refresh_failures,
+            "hit_ratio": (self.hits + self.stale_hits + self.coalesced) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,129 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    """The supported encoding the client prefers (br over gzip on a tie), or None."""
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class StreamCompressor:
+    """Compresses a response body chunk by chunk; each chunk is flushed so it can be decoded on arrival."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 31: gzip container
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """gzip or brotli for clients that accept it, including SSE streams.
+
+    Whole responses smaller than minimum_size go out as they are. Streamed
+    responses (SSE, or any body sent in several parts) are compressed with a
+    flush after every part, so events are not held back, and they share one
+    compression context, so keys repeated across events cost little.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, gzip_level: int = 6,
+                 brotli_quality: int = 4, exclude_prefixes: tuple[str, ...] = ()):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.exclude_prefixes = exclude_prefixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, CompressingSend(send, encoding, self))
+
+
+class CompressingSend:
+    """The send callable handed to the app for one response."""
+
+    def __init__(self, send: Send, encoding: str, options: CompressionMiddleware):
+        self.send = send
+        self.encoding = encoding
+        self.options = options
+        self.start: Message | None = None
+        # Only set for compressed streams; later parts of anything else pass through unchanged
+        self.compressor: StreamCompressor | None = None
+        self.started = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            body = await self._begin(body, more_body)
+        elif self.compressor is not None:
+            body = self.compressor.compress(body, final=not more_body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    async def _begin(self, body: bytes, more_body: bool) -> bytes:
+        """Send the response start, compressing if worthwhile; returns the first body part to send."""
+        headers = MutableHeaders(raw=self.start["headers"])
+        streaming = more_body or headers.get("content-type", "").startswith("text/event-stream")
+        if "content-encoding" in headers or (not streaming and len(body) < self.options.minimum_size):
+            await self.send(self.start)
+            return body
+        compressor = StreamCompressor(self.encoding, self.options.gzip_level, self.options.brotli_quality)
+        body = compressor.compress(body, final=not more_body)
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("accept-encoding")
+        if streaming:
+            self.compressor = compressor
+            if "content-length" in headers:
+                del headers["content-length"]
+        else:
+            headers["content-length"] = str(len(body))
+        await self.send(self.start)
+        return body
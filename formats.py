@@ -0,0 +1,125 @@
+from typing import Any, Callable, Iterable
+import csv
+import io
+import json
+import sys
+
+from serialization import dumps
+
+FORMATS = ("json", "columnar", "csv")
+
+
+def round_value(value: Any, precision: int) -> Any:
+    """Round floats to precision significant digits; other values pass through."""
+    if isinstance(value, float):
+        return float(f"{value:.{precision}g}")
+    return value
+
+
+def round_rows(rows: list[dict[str, Any]], precision: int | None) -> list[dict[str, Any]]:
+    if precision is None:
+        return rows
+    return [{key: round_value(value, precision) for key, value in row.items()} for row in rows]
+
+
+def csv_cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return dumps(value)
+    return value
+
+
+def format_rows(rows: list[dict[str, Any]], columns: list[str],
+                fmt: str = "json", precision: int | None = None) -> str:
+    """Serialize projected rows as json (list of objects), columnar or csv.
+
+    columnar is {"columns": [...], "rows": [[...], ...]}, so each key is sent
+    once instead of once per token.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt} (expected one of {', '.join(FORMATS)})")
+    rows = round_rows(rows, precision)
+
+    if fmt == "json":
+        return dumps(rows)
+    if fmt == "columnar":
+        return dumps({
+            "columns": columns,
+            "rows": [[row.get(column) for column in columns] for row in rows],
+        })
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([csv_cell(row.get(column)) for column in columns])
+    return buffer.getvalue()
+
+
+def fit_rows(rows: list[dict[str, Any]], columns: list[str], fmt: str = "json",
+             precision: int | None = None, max_bytes: int = 0,
+             drop_order: Iterable[str] = (),
+             render: Callable[[list[dict[str, Any]], list[str]], str] | None = None) -> tuple[str, list[str], int]:
+    """Format rows within max_bytes of UTF-8 (0: no limit).
+
+    Columns in drop_order are dropped first, one at a time, then trailing
+    rows. If not even an empty result fits, the text is empty. Returns the
+    text, the dropped columns and the number of rows kept. render(rows,
+    columns) serializes results that are not a plain table (default:
+    format_rows in fmt).
+    """
+    if render is None:
+        def render(rows: list[dict[str, Any]], columns: list[str]) -> str:
+            return format_rows(rows, columns, fmt, precision)
+
+    text = render(rows, columns)
+    if not max_bytes or len(text.encode("utf-8")) <= max_bytes:
+        return text, [], len(rows)
+
+    dropped = []
+    for column in drop_order:
+        if column not in columns:
+            continue
+        columns = [name for name in columns if name != column]
+        dropped.append(column)
+        rows = [{name: row[name] for name in columns if name in row} for row in rows]
+        text = render(rows, columns)
+        if len(text.encode("utf-8")) <= max_bytes:
+            return text, dropped, len(rows)
+
+    # Largest row count that fits
+    low, high = 0, len(rows) - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if len(render(rows[:middle], columns).encode("utf-8")) <= max_bytes:
+            low = middle
+        else:
+            high = middle - 1
+    text = render(rows[:low], columns)
+    if len(text.encode("utf-8")) > max_bytes:
+        # Not even the empty result's header (csv) or skeleton (columnar) fits
+        text = ""
+    return text, dropped, low
+
+
+def compare_sizes(rows: list[dict[str, Any]], precision: int | None = None) -> dict[str, int]:
+    """Encoded size in bytes of rows in every format."""
+    columns = list(rows[0]) if rows else []
+    return {
+        fmt: len(format_rows(rows, columns, fmt, precision).encode("utf-8"))
+        for fmt in FORMATS
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python formats.py <tool_output.json> [precision]
+    # Prints the size of a saved tool result (a JSON list of rows) per format.
+    with open(sys.argv[1], encoding="utf-8") as f:
+        sample_rows = json.load(f)
+    sample_precision = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    sizes = compare_sizes(sample_rows, sample_precision)
+    baseline = len(dumps(sample_rows).encode("utf-8"))
+    print(f"{len(sample_rows)} rows, precision={sample_precision}")
+    for fmt, size in sizes.items():
+        print(f"{fmt:>9}: {size:>8} bytes ({size / baseline:.0%} of unrounded json)")
@@ -0,0 +1,208 @@
+from typing import Any
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger('boltrade_api')
+
+# Numeric columns kept per snapshot; each tool maps its own output fields onto them
+METRICS = ("price", "score", "liquidity", "market_cap", "fdv", "volume")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS snapshots (
+    source TEXT NOT NULL,
+    address TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    rank INTEGER,
+    {", ".join(f"{metric} REAL" for metric in METRICS)},
+    PRIMARY KEY (address, source, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS snapshots_ts ON snapshots (ts);
+"""
+
+
+def to_float(value: Any) -> float | None:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class HistoryStore:
+    """Append-only SQLite store of token snapshots.
+
+    record() only buffers rows; a background task writes them in one
+    transaction every flush_interval seconds (or sooner once batch_size rows
+    are waiting). Rows older than downsample_after are thinned to the last
+    one per bucket seconds, and rows older than retention are deleted. All
+    database work runs in a worker thread so the event loop never blocks on
+    disk.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 5.0, batch_size: int = 500,
+                 retention: float = 7 * 86400, downsample_after: float = 86400,
+                 bucket: float = 3600, maintenance_interval: float = 600):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention = retention
+        self.downsample_after = downsample_after
+        self.bucket = bucket
+        self.maintenance_interval = maintenance_interval
+        self._pending: list[tuple] = []
+        self._flush_requested = asyncio.Event()
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+        self.written = 0
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL lets other workers read while one writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        self._conn = conn
+
+    def _execute(self, sql: str, params: tuple | list = ()) -> list[tuple]:
+        with self._lock:
+            if self._conn is None:
+                raise ValueError("history store is disabled")
+            return self._conn.execute(sql, params).fetchall()
+
+    async def start(self) -> None:
+        if self._task is None:
+            await asyncio.to_thread(self._open)
+            self._task = asyncio.create_task(self.run())
+            logger.info(f"History store at {self.path}")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+        with self._lock:
+            self._conn.close()
+            self._conn = None
+
+    def record(self, source: str, rows: list[dict[str, Any]], first_rank: int = 1) -> None:
+        """Buffer one page of snapshot rows: dicts with an address and METRICS keys."""
+        if self._task is None:
+            return
+        ts = int(time.time())
+        for rank, row in enumerate(rows, first_rank):
+            address = row.get("address")
+            if not address:
+                continue
+            self._pending.append(
+                (source, address, ts, rank, *(to_float(row.get(metric)) for metric in METRICS)))
+        if len(self._pending) >= self.batch_size:
+            self._flush_requested.set()
+
+    def _write(self, rows: list[tuple]) -> None:
+        placeholders = ", ".join("?" * (4 + len(METRICS)))
+        with self._lock, self._conn:
+            self._conn.executemany(f"INSERT OR REPLACE INTO snapshots VALUES ({placeholders})", rows)
+
+    async def flush(self) -> None:
+        rows, self._pending = self._pending, []
+        if rows:
+            await asyncio.to_thread(self._write, rows)
+            self.written += len(rows)
+
+    def _maintain(self, now: int) -> tuple[int, int]:
+        with self._lock, self._conn:
+            expired = self._conn.execute(
+                "DELETE FROM snapshots WHERE ts < ?", (now - int(self.retention),)).rowcount
+            # Keep only the newest row per address and bucket once rows are old enough
+            thinned = self._conn.execute(
+                """DELETE FROM snapshots WHERE ts < ? AND ts NOT IN (
+                       SELECT MAX(ts) FROM snapshots AS latest
+                       WHERE latest.source = snapshots.source AND latest.address = snapshots.address
+                         AND latest.ts / ? = snapshots.ts / ?)""",
+                (now - int(self.downsample_after), int(self.bucket), int(self.bucket))).rowcount
+        return expired, thinned
+
+    async def maintain(self) -> None:
+        expired, thinned = await asyncio.to_thread(self._maintain, int(time.time()))
+        if expired or thinned:
+            logger.info(f"History maintenance: {expired} expired, {thinned} downsampled rows removed")
+
+    async def run(self) -> None:
+        last_maintenance = 0.0
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+                if time.monotonic() - last_maintenance >= self.maintenance_interval:
+                    last_maintenance = time.monotonic()
+                    await self.maintain()
+            except sqlite3.Error as e:
+                logger.error(f"History store error: {type(e).__name__}: {e}")
+
+    async def history(self, address: str, since: float, source: str | None = None,
+                      limit: int = 100) -> list[dict[str, Any]]:
+        """Snapshots of address newer than since (unix time), oldest first, at most limit (the newest)."""
+        sql = f"SELECT source, ts, rank, {', '.join(METRICS)} FROM snapshots WHERE address = ? AND ts >= ?"
+        params: list[Any] = [address, int(since)]
+        if source is not None:
+            sql += " AND source = ?"
+            params.append(source)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        params.append(limit)
+        rows = await asyncio.to_thread(self._execute, sql, params)
+        columns = ("source", "ts", "rank") + METRICS
+        return [dict(zip(columns, row)) for row in reversed(rows)]
+
+    async def movers(self, source: str, metric: str, since: float, limit: int = 10,
+                     relative: bool = True, direction: str = "both") -> list[dict[str, Any]]:
+        """Addresses with the largest change of metric between their first and last snapshot since since."""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric} (expected one of {', '.join(METRICS)})")
+        # SQLite returns the bare column from the row holding MIN(ts) / MAX(ts)
+        sql = f"""
+            WITH recent AS (
+                SELECT address, ts, {metric} AS value FROM snapshots
+                WHERE source = ? AND ts >= ? AND {metric} IS NOT NULL
+            ),
+            opening AS (SELECT address, MIN(ts) AS ts, value FROM recent GROUP BY address),
+            closing AS (SELECT address, MAX(ts) AS ts, value, COUNT(*) AS samples FROM recent GROUP BY address)
+            SELECT opening.address, opening.ts, opening.value, closing.ts, closing.value, closing.samples
+            FROM opening JOIN closing USING (address)
+            WHERE closing.ts > opening.ts
+        """
+        rows = await asyncio.to_thread(self._execute, sql, (source, int(since)))
+        movers = []
+        for address, first_ts, first_value, last_ts, last_value, samples in rows:
+            change = last_value - first_value
+            pct_change = change / abs(first_value) if first_value else None
+            key = pct_change if relative else change
+            if not key or (direction == "up" and key < 0) or (direction == "down" and key > 0):
+                continue
+            movers.append({
+                "address": address, "from": first_value, "to": last_value,
+                "change": change, "pct_change": pct_change,
+                "first_ts": first_ts, "last_ts": last_ts, "samples": samples,
+            })
+        movers.sort(key=lambda mover: abs(mover["pct_change"] if relative else mover["change"]), reverse=True)
+        return movers[:limit]
+
+    def stats(self) -> dict[str, Any]:
+        return {"path": self.path, "pending": len(self._pending), "written": self.written}
@@ -0,0 +1,246 @@
+"""Load generator for the MCP server, against mock_upstream.py by default.
+
+Starts the mock upstream and the server as subprocesses, opens --sessions
+concurrent /sse sessions, and has each one send --calls tools/call requests
+through /messages/. Then it reports latency percentiles, throughput and
+server RSS. Runs are seeded, so the same arguments replay the same calls.
+Save a run with --output and compare a later one against it with --compare.
+
+    python loadtest.py --sessions 50 --calls 20 --output before.json
+    python loadtest.py --sessions 50 --calls 20 --compare before.json
+"""
+from typing import Any
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# (tool, arguments) pairs drawn uniformly for each call
+TOOL_MIX = [
+    ("get-sol-top-score-list", {"limit": 10}),
+    ("get-sol-top-score-list", {"limit": 50, "format": "columnar"}),
+    ("get-sol-smart-money-listing", {"limit": 10}),
+    ("get-sol-smart-money-listing", {"fields": ["CA address", "symbol", "current_price"]}),
+    ("query-sol-tokens", {"filter": "score > 50", "sort": "score desc", "limit": 10}),
+]
+
+# Metrics where a lower value is better, used to label changes in --compare
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "max_ms", "mean_ms", "connect_p95_ms",
+                   "errors", "peak_rss_mb", "upstream_requests")
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0), len(ordered) - 1)]
+
+
+def process_rss_mb(pid: int) -> float:
+    """Resident set size of pid and its children, from /proc (Linux only)."""
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total / 1024
+
+
+async def wait_for(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout}s")
+            await asyncio.sleep(0.2)
+
+
+async def run_session(index: int, url: str, calls: int, seed: int,
+                      latencies: list[float], connects: list[float], errors: list[str]) -> None:
+    rng = random.Random(f"{seed}:{index}")
+    started = time.perf_counter()
+    try:
+        async with sse_client(url) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                connects.append(time.perf_counter() - started)
+                for _ in range(calls):
+                    name, arguments = rng.choice(TOOL_MIX)
+                    call_started = time.perf_counter()
+                    try:
+                        result = await session.call_tool(name, arguments)
+                        if result.isError:
+                            errors.append(f"{name}: {result.content[0].text[:80]}")
+                    except Exception as e:
+                        errors.append(f"{name}: {type(e).__name__}: {e}")
+                    latencies.append(time.perf_counter() - call_started)
+    except Exception as e:
+        errors.append(f"session {index}: {type(e).__name__}: {e}")
+
+
+async def sample_rss(pid: int, samples: list[float], interval: float = 0.2) -> None:
+    while True:
+        samples.append(process_rss_mb(pid))
+        await asyncio.sleep(interval)
+
+
+async def load(args: argparse.Namespace, server_pid: int | None) -> dict[str, Any]:
+    base = f"http://127.0.0.1:{args.port}"
+    sse_url = f"{base}/sse"
+
+    # Warm-up session so imports, connection pools and the cache are primed
+    await run_session(-1, sse_url, args.warmup, args.seed, [], [], [])
+
+    latencies: list[float] = []
+    connects: list[float] = []
+    errors: list[str] = []
+    rss: list[float] = []
+    sampler = asyncio.create_task(sample_rss(server_pid, rss)) if server_pid else None
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(index, sse_url, args.calls, args.seed, latencies, connects, errors)
+        for index in range(args.sessions)
+    ))
+    elapsed = time.perf_counter() - started
+    if sampler is not None:
+        sampler.cancel()
+
+    upstream_requests = None
+    if not args.target:
+        async with httpx.AsyncClient() as client:
+            upstream_requests = (await client.get(f"http://127.0.0.1:{args.mock_port}/mock/stats")).json()["requests"]
+
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "sessions": args.sessions,
+        "calls": len(latencies),
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms, default=0.0), 2),
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else 0.0,
+        "connect_p95_ms": round(percentile([c * 1000 for c in connects], 95), 2),
+        "peak_rss_mb": round(max(rss), 1) if rss else None,
+        "upstream_requests": upstream_requests,
+        "sample_errors": errors[:5],
+    }
+
+
+def start_mock(args: argparse.Namespace) -> subprocess.Popen:
+    return subprocess.Popen([
+        sys.executable, os.path.join(HERE, "mock_upstream.py"),
+        "--port", str(args.mock_port), "--fixtures", args.fixtures,
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate), "--seed", str(args.seed),
+    ])
+
+
+def start_server(args: argparse.Namespace, workdir: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        UPSTREAM_BASE_URL=f"http://127.0.0.1:{args.mock_port}",
+        PROXY_URLS="direct",
+        PORT=str(args.port),
+        WORKERS=str(args.workers),
+        HISTORY_PATH=os.path.join(workdir, "history.sqlite3"),
+        LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+    )
+    output = open(args.server_log, "ab") if args.server_log else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, os.path.join(HERE, "main.py")], env=env, cwd=workdir,
+                            stdout=output, stderr=subprocess.STDOUT)
+
+
+def print_report(result: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    for key, value in result.items():
+        if key == "sample_errors":
+            continue
+        line = f"{key:>18}: {value}"
+        previous = baseline.get(key) if baseline else None
+        if isinstance(value, (int, float)) and isinstance(previous, (int, float)) and previous:
+            change = (value - previous) / previous
+            better = change < 0 if key in LOWER_IS_BETTER else change > 0
+            line += f"  (was {previous}, {change:+.1%}{', better' if better and change else ''})"
+        print(line)
+    for error in result["sample_errors"]:
+        print(f"  error: {error}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent SSE sessions")
+    parser.add_argument("--calls", type=int, default=20, help="tool calls per session")
+    parser.add_argument("--warmup", type=int, default=5, help="calls made before measuring")
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes")
+    parser.add_argument("--port", type=int, default=3102, help="server port")
+    parser.add_argument("--mock-port", type=int, default=8100)
+    parser.add_argument("--fixtures", default=os.path.join(HERE, "fixtures"))
+    parser.add_argument("--latency", type=float, default=50.0, help="mock upstream latency in ms")
+    parser.add_argument("--jitter", type=float, default=20.0, help="mock upstream jitter in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock upstream error share")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--target", action="store_true",
+                        help="load an already running server on --port instead of starting one")
+    parser.add_argument("--server-log", help="append the server's output to this file")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    processes = []
+    with tempfile.TemporaryDirectory(prefix="boltrade-loadtest-") as workdir:
+        try:
+            if not args.target:
+                # The mock must be up before the server starts prefetching from it
+                processes.append(start_mock(args))
+                asyncio.run(wait_for(f"http://127.0.0.1:{args.mock_port}/"))
+                processes.append(start_server(args, workdir))
+            asyncio.run(wait_for(f"http://127.0.0.1:{args.port}/ready"))
+            result = asyncio.run(load(args, processes[1].pid if processes else None))
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
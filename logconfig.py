@@ -0,0 +1,54 @@
+from datetime import datetime
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    The stock prepare() formats every record in the calling thread; the queue
+    is in-process here, so the record can be handed over as is.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+log_listener: logging.handlers.QueueListener | None = None
+
+def setup_logging(level: str = "INFO", log_dir: str = "logs") -> logging.Logger:
+    """Configure logging settings (once per process; later calls just return the logger)"""
+    global log_listener
+    if log_listener is not None:
+        return logging.getLogger('boltrade_api')
+    # Create logs directory if it doesn't exist
+    os.makedirs(log_dir, exist_ok=True)
+
+    # Generate log filename with timestamp
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    log_file = os.path.join(log_dir, f'boltrade_api_{timestamp}.log')
+
+    # Configure logging format
+    formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
+    handlers = [
+        logging.FileHandler(log_file, encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Callers only enqueue records; file and stderr I/O happen on the listener thread
+    log_queue = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    log_listener.start()
+    # Flush queued records before the process exits
+    atexit.register(log_listener.stop)
+    logging.basicConfig(
+        level=level.upper(),
+        handlers=[DeferredQueueHandler(log_queue)]
+    )
+    # httpx logs every request at INFO; make_boltrade_request already logs a summary line
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    return logging.getLogger('boltrade_api')
@@ -0,0 +1,44 @@
+"""Server entry point: python main.py (python server.py does the same).
+
+Settings are parsed and logging is set up before anything heavy is
+imported. The server module (MCP SDK, Starlette, httpx) is only loaded by
+processes that serve requests, so the supervisor of a multi-worker run
+starts in a fraction of the time. Startup stages are timed, logged once
+the upstream pool is warm, and served at /ready.
+"""
+from startup import profile
+from typing import Any
+import os
+
+from logconfig import setup_logging
+from settings import load_settings
+from workers import WorkerTopology, run_supervisor, serve_worker
+
+
+def main(app: Any = None) -> None:
+    settings = load_settings()
+    logger = setup_logging(settings.log_level, settings.log_dir)
+    profile.mark("settings")
+    topology = WorkerTopology.from_env()
+    try:
+        if settings.workers > 1 and not topology.enabled:
+            logger.info(f"Starting server on {settings.host}:{settings.port}")
+            run_supervisor(os.path.abspath(__file__), settings.host, settings.port, settings.workers)
+            return
+        if app is None:
+            from server import app
+        profile.mark("imports")
+        if topology.enabled:
+            serve_worker(app, topology)
+        else:
+            import uvicorn
+
+            logger.info(f"Starting server on {settings.host}:{settings.port}")
+            uvicorn.run(app, host=settings.host, port=settings.port, timeout_graceful_shutdown=5)
+    except Exception as e:
+        logger.error(f"Server startup error: {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
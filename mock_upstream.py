@@ -0,0 +1,198 @@
+"""Local stand-in for the findgems API, for benchmarks and offline runs.
+
+Serves /onchain/v1/findgems/<endpoint> from fixture files, paging them by
+start and limit like the real API, with configurable latency, jitter and
+error injection. Fixtures are plain upstream response bodies saved as
+fixtures/<endpoint>.json; missing ones are generated from --seed, and
+--record saves real ones fetched through the server's configured proxy.
+
+    python mock_upstream.py --record 10
+    python mock_upstream.py --port 8100 --latency 80 --jitter 40 --error-rate 0.02
+    UPSTREAM_BASE_URL=http://127.0.0.1:8100 PROXY_URLS=direct python main.py
+"""
+from typing import Any
+import argparse
+import asyncio
+import json
+import os
+import random
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+LIST_KEYS = {
+    "top_score": "users",
+    "smart_money_new_listing_buy": "smart_money_new_listing_buy",
+}
+
+
+def generate_tokens(endpoint: str, count: int, rng: random.Random) -> list[dict[str, Any]]:
+    """Synthetic tokens shaped like the real endpoint's, including fields the server ignores."""
+    tokens = []
+    for i in range(count):
+        address = "".join(rng.choice("123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz") for _ in range(44))
+        price = 10 ** rng.uniform(-8, 1)
+        market_cap = 10 ** rng.uniform(4, 9)
+        common = {
+            "symbol": f"TKN{i}",
+            "name": f"Token {i}",
+            "logo": f"https://example.invalid/logo/{i}.png",
+            "market_cap": market_cap,
+            "fdv": market_cap * rng.uniform(1, 1.5),
+            "score": round(rng.uniform(0, 100), 2),
+            "token_age": f"{rng.randint(1, 29)}d {rng.randint(0, 23)}h",
+            "holders": rng.randint(10, 100000),
+            "description": "x" * rng.randint(50, 400),
+        }
+        if endpoint == "top_score":
+            tokens.append(dict(
+                common,
+                token_address=address,
+                usd_price=price,
+                volume_h24=10 ** rng.uniform(3, 8),
+                price_change_h24=rng.uniform(-80, 300),
+                liquidity_usd=10 ** rng.uniform(3, 7),
+            ))
+        else:
+            tokens.append(dict(
+                common,
+                address=address,
+                current_price=price,
+                avg_price=price * rng.uniform(0.5, 1.5),
+                pnl=rng.uniform(-1, 5),
+                price_change_24h=rng.uniform(-80, 300),
+                NumberOfSmartMoney=rng.randint(1, 40),
+                usdt_value=rng.uniform(100, 100000),
+                total_spent=rng.uniform(100, 100000),
+                liquidity=10 ** rng.uniform(3, 7),
+                risk=rng.choice(["low", "medium", "high"]),
+                websites=[f"https://example.invalid/{i}"],
+                telegram_handle=f"tkn{i}",
+                twitter_handle=f"tkn{i}",
+                discord_url=None,
+            ))
+    return tokens
+
+
+def save_fixture(directory: str, endpoint: str, tokens: list[dict[str, Any]]) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{endpoint}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({LIST_KEYS[endpoint]: tokens}, f)
+    return path
+
+
+def load_fixtures(directory: str, count: int, seed: int) -> dict[str, list[dict[str, Any]]]:
+    """Token lists per endpoint, read from directory or generated (and saved) when missing."""
+    fixtures = {}
+    for endpoint, list_key in LIST_KEYS.items():
+        path = os.path.join(directory, f"{endpoint}.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                fixtures[endpoint] = json.load(f)[list_key]
+            continue
+        fixtures[endpoint] = generate_tokens(endpoint, count, random.Random(f"{seed}:{endpoint}"))
+        save_fixture(directory, endpoint, fixtures[endpoint])
+    return fixtures
+
+
+async def record_fixtures(directory: str, pages: int) -> None:
+    """Fetch the first pages of each endpoint from the real upstream and save them as fixtures.
+
+    Requests go out like the server's own: through the first proxy of
+    PROXY_URLS (or PROXY_*), with the same headers and query parameters.
+    """
+    # Only recording needs the server's proxy and upstream configuration
+    import server
+
+    proxy_urls = server.proxy_urls_from_env()
+    if not proxy_urls:
+        raise SystemExit("No upstream proxy configured; set PROXY_URLS (or PROXY_URLS=direct)")
+    async with server.create_http_client(proxy_urls[0]) as client:
+        for endpoint, list_key in LIST_KEYS.items():
+            frame = server.FINDGEMS_TOOLS[server.TOOLS_BY_ENDPOINT[endpoint]].frame
+            tokens = []
+            for page in range(1, pages + 1):
+                url = server.findgems_url(endpoint, {
+                    "limit": server.UPSTREAM_PAGE_SIZE, "start": page, "chain": "solana", "frame": frame,
+                })
+                response = await client.get(url)
+                response.raise_for_status()
+                page_tokens = response.json().get(list_key) or []
+                tokens.extend(page_tokens)
+                if len(page_tokens) < server.UPSTREAM_PAGE_SIZE:
+                    break
+            path = save_fixture(directory, endpoint, tokens)
+            print(f"Recorded {len(tokens)} {endpoint} tokens to {path}")
+
+
+def create_app(fixtures: dict[str, list[dict[str, Any]]], latency: float = 0.0, jitter: float = 0.0,
+               error_rate: float = 0.0, error_status: int = 503, timeout_rate: float = 0.0,
+               seed: int = 0) -> Starlette:
+    """Replay fixtures with latency (seconds) plus uniform jitter, random errors and hangs."""
+    rng = random.Random(seed)
+    counters = {"requests": 0, "errors": 0, "timeouts": 0}
+
+    async def findgems(request: Request):
+        counters["requests"] += 1
+        endpoint = request.path_params["endpoint"]
+        if endpoint not in fixtures:
+            return JSONResponse({"error": "not found"}, status_code=404)
+        delay = max(latency + rng.uniform(-jitter, jitter), 0.0)
+        roll = rng.random()
+        if roll < timeout_rate:
+            counters["timeouts"] += 1
+            # Longer than any client timeout
+            await asyncio.sleep(60)
+        await asyncio.sleep(delay)
+        if roll < timeout_rate + error_rate:
+            counters["errors"] += 1
+            return JSONResponse({"error": "injected"}, status_code=error_status)
+        start = max(int(request.query_params.get("start", 1)), 1)
+        limit = int(request.query_params.get("limit", 10))
+        page = fixtures[endpoint][(start - 1) * limit:start * limit]
+        return Response(json.dumps({LIST_KEYS[endpoint]: page}), media_type="application/json")
+
+    async def root(request: Request):
+        return JSONResponse({"status": "ok"})
+
+    async def stats(request: Request):
+        return JSONResponse(counters)
+
+    return Starlette(routes=[
+        Route("/", endpoint=root),
+        Route("/mock/stats", endpoint=stats),
+        Route("/onchain/v1/findgems/{endpoint}", endpoint=findgems),
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--fixtures", default="fixtures", help="directory of <endpoint>.json response bodies")
+    parser.add_argument("--tokens", type=int, default=200, help="tokens per generated fixture")
+    parser.add_argument("--latency", type=float, default=50.0, help="base latency in ms")
+    parser.add_argument("--jitter", type=float, default=20.0, help="+/- uniform jitter in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="share of requests that hang")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--record", type=int, metavar="PAGES",
+                        help="save this many real upstream pages per endpoint as fixtures, then exit")
+    args = parser.parse_args()
+
+    if args.record:
+        asyncio.run(record_fixtures(args.fixtures, args.record))
+        return
+    fixtures = load_fixtures(args.fixtures, args.tokens, args.seed)
+    app = create_app(fixtures, args.latency / 1000, args.jitter / 1000, args.error_rate,
+                     args.error_status, args.timeout_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+from typing import Any
+import logging
+import secrets
+
+import httpx
+from starlette.requests import Request
+from starlette.responses import Response
+
+from workers import WorkerTopology
+
+logger = logging.getLogger('boltrade_api')
+
+PEER_TOKEN_HEADER = "x-boltrade-peer-token"
+# The client a page request is made for, so the owner queues it fairly under that client
+PEER_CLIENT_HEADER = "x-boltrade-peer-client"
+# Hop-by-hop headers that must not be copied onto a forwarded request
+HOP_HEADERS = {"host", "connection", "keep-alive", "transfer-encoding", "content-length"}
+
+
+class PeerClient:
+    """HTTP over the other workers' private Unix sockets."""
+
+    def __init__(self, topology: WorkerTopology, timeout: float = 15.0):
+        self.topology = topology
+        self.timeout = timeout
+        self._clients: dict[int, httpx.AsyncClient] = {}
+
+    def client(self, index: int) -> httpx.AsyncClient:
+        client = self._clients.get(index)
+        if client is None:
+            client = self._clients[index] = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=self.topology.socket_path(index)),
+                base_url=f"http://worker-{index}",
+                headers={PEER_TOKEN_HEADER: self.topology.peer_token},
+                timeout=self.timeout,
+            )
+        return client
+
+    def is_peer_request(self, request: Request) -> bool:
+        token = request.headers.get(PEER_TOKEN_HEADER)
+        return token is not None and secrets.compare_digest(token, self.topology.peer_token or "")
+
+    async def forward(self, index: int, request: Request) -> Response:
+        """Replay request on worker index and relay its response."""
+        headers = {key: value for key, value in request.headers.items() if key not in HOP_HEADERS}
+        try:
+            response = await self.client(index).request(
+                request.method, request.url.path, params=request.query_params,
+                headers=headers, content=await request.body(),
+            )
+        except httpx.HTTPError as e:
+            logger.error(f"Forwarding {request.url.path} to worker {index} failed: {type(e).__name__}: {e}")
+            return Response("Session worker unavailable", status_code=503)
+        return Response(response.content, status_code=response.status_code,
+                        media_type=response.headers.get("content-type"))
+
+    async def post_json(self, index: int, path: str, payload: Any, client: str | None = None) -> httpx.Response:
+        headers = {PEER_CLIENT_HEADER: client} if client is not None else None
+        return await self.client(index).post(path, json=payload, headers=headers)
+
+    async def aclose(self) -> None:
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
@@ -0,0 +1,67 @@
+from typing import Any, Awaitable, Callable
+import asyncio
+import logging
+import time
+
+from cache import ResponseCache
+
+logger = logging.getLogger('boltrade_api')
+
+
+class Prefetcher:
+    """Background task that keeps hot cache entries warm.
+
+    Every interval seconds each target (endpoint, request_data) is refreshed
+    through the response cache, so tool calls for those pages are answered
+    from memory. A failed refresh keeps serving the last good snapshot.
+    """
+
+    def __init__(self, cache: ResponseCache,
+                 targets: list[tuple[str, dict[str, Any]]],
+                 fetch_factory: Callable[[str, dict[str, Any]], Callable[[], Awaitable[Any]]],
+                 interval: float = 10.0):
+        self.cache = cache
+        self.targets = targets
+        self.fetch_factory = fetch_factory
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None and self.targets:
+            self._task = asyncio.create_task(self.run())
+            logger.info(f"Prefetcher started: {len(self.targets)} pages every {self.interval}s")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def refresh_all(self) -> int:
+        """Refresh every target once, returning the number that failed."""
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *(self.cache.refresh(endpoint, params, self.fetch_factory(endpoint, params))
+              for endpoint, params in self.targets),
+            return_exceptions=True,
+        )
+        failed = 0
+        for (endpoint, params), result in zip(self.targets, results):
+            # A failed refresh hands back the previous entry (or None)
+            if isinstance(result, BaseException) or result is None or result.stored_at < started:
+                failed += 1
+                reason = repr(result) if isinstance(result, BaseException) else "upstream error"
+                logger.warning(f"Prefetch failed for {endpoint} {params}: {reason}")
+        return failed
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.refresh_all()
+            except Exception as e:
+                logger.error(f"Prefetch cycle error: {type(e).__name__}: {e}")
+            await asyncio.sleep(self.interval)
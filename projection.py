@@ -0,0 +1,43 @@
+from typing import Any, Iterable
+
+# Distinct field selections kept per projection
+MAX_SELECTIONS = 64
+
+
+class Projection:
+    """Precompiled mapping from upstream token dicts to tool output rows.
+
+    Fields are declared once as (output_key, source_key) pairs; missing
+    source keys project to None, matching dict.get.
+    """
+
+    def __init__(self, fields: list[tuple[str, str]]):
+        self.fields = list(fields)
+        self.output_keys = [output_key for output_key, _ in self.fields]
+        self._source_keys = tuple(source_key for _, source_key in self.fields)
+        self._selections: dict[frozenset[str], Projection] = {}
+
+    def select(self, names: list[str] | None) -> "Projection":
+        """Return the projection restricted to names, in declaration order."""
+        if not names:
+            return self
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            raise ValueError("fields must be a list of field names")
+        key = frozenset(names)
+        selected = self._selections.get(key)
+        if selected is None:
+            unknown = key.difference(self.output_keys)
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+            if len(self._selections) >= MAX_SELECTIONS:
+                del self._selections[next(iter(self._selections))]
+            selected = self._selections[key] = Projection([field for field in self.fields if field[0] in key])
+        return selected
+
+    def row(self, token: dict[str, Any]) -> dict[str, Any]:
+        return dict(zip(self.output_keys, map(token.get, self._source_keys)))
+
+    def __call__(self, tokens: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+        keys = self.output_keys
+        sources = self._source_keys
+        return [dict(zip(keys, map(token.get, sources))) for token in tokens]
@@ -0,0 +1,195 @@
+from typing import Any, Callable
+import asyncio
+import logging
+import time
+import urllib.parse
+
+import httpx
+
+logger = logging.getLogger('boltrade_api')
+
+# Responses that mean the proxy itself failed rather than the upstream
+PROXY_FAILURE_STATUSES = {407}
+# Pseudo proxy URL for connecting without a proxy (local benchmarks)
+DIRECT = "direct"
+
+
+def proxy_label(proxy_url: str) -> str:
+    """host:port of a proxy URL, safe to log (credentials stripped)."""
+    if proxy_url == DIRECT:
+        return DIRECT
+    parts = urllib.parse.urlsplit(proxy_url)
+    return f"{parts.hostname}:{parts.port}" if parts.port else str(parts.hostname)
+
+
+class ProxyEndpoint:
+    """One proxy with its own connection pool and health statistics."""
+
+    def __init__(self, url: str, client: httpx.AsyncClient, alpha: float = 0.3):
+        self.url = url
+        self.label = proxy_label(url)
+        self.client = client
+        self.alpha = alpha
+        self.outstanding = 0
+        self.ewma_latency: float | None = None
+        self.ewma_errors = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejected_until > time.monotonic()
+
+    def record_success(self, latency: float) -> None:
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.ewma_errors *= 1 - self.alpha
+        self.ewma_latency = latency if self.ewma_latency is None else (
+            self.alpha * latency + (1 - self.alpha) * self.ewma_latency)
+
+    def record_failure(self) -> None:
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.ewma_errors = self.alpha + (1 - self.alpha) * self.ewma_errors
+
+    def cost(self, default_latency: float) -> float:
+        """Expected wait if picked now: latency scaled by queued work and error rate."""
+        latency = self.ewma_latency if self.ewma_latency is not None else default_latency
+        return latency * (self.outstanding + 1) / max(1.0 - self.ewma_errors, 0.05)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "proxy": self.label,
+            "outstanding": self.outstanding,
+            "ewma_latency": self.ewma_latency,
+            "error_rate": self.ewma_errors,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejected": self.ejected,
+        }
+
+
+class ProxyPool:
+    """Balances upstream requests across proxies and ejects unhealthy ones.
+
+    strategy "ewma" picks the lowest latency * (outstanding + 1) cost;
+    "least_outstanding" picks the fewest in-flight requests, breaking ties on
+    latency. A proxy is ejected for eject_seconds after
+    eject_after_failures consecutive failures or when its error rate passes
+    eject_error_rate, and is re-probed in the background until it answers.
+    """
+
+    def __init__(self, proxy_urls: list[str], client_factory: Callable[[str], httpx.AsyncClient],
+                 strategy: str = "ewma", eject_after_failures: int = 3,
+                 eject_error_rate: float = 0.5, eject_seconds: float = 30.0,
+                 probe_url: str | None = None, probe_interval: float = 10.0):
+        if not proxy_urls:
+            raise ValueError("ProxyPool needs at least one proxy")
+        if strategy not in ("ewma", "least_outstanding"):
+            raise ValueError(f"Unknown proxy balancing strategy: {strategy}")
+        self.proxies = [ProxyEndpoint(url, client_factory(url)) for url in proxy_urls]
+        self.strategy = strategy
+        self.eject_after_failures = eject_after_failures
+        self.eject_error_rate = eject_error_rate
+        self.eject_seconds = eject_seconds
+        self.probe_url = probe_url
+        self.probe_interval = probe_interval
+        self._probe_task: asyncio.Task | None = None
+
+    @property
+    def headers(self) -> httpx.Headers:
+        return self.proxies[0].client.headers
+
+    def pick(self) -> ProxyEndpoint:
+        healthy = [proxy for proxy in self.proxies if not proxy.ejected]
+        if not healthy:
+            # Everything is ejected: use the proxy due back soonest rather than failing
+            return min(self.proxies, key=lambda proxy: proxy.ejected_until)
+        known = [proxy.ewma_latency for proxy in healthy if proxy.ewma_latency is not None]
+        default_latency = min(known) if known else 1.0
+        if self.strategy == "least_outstanding":
+            return min(healthy, key=lambda proxy: (proxy.outstanding, proxy.cost(default_latency)))
+        return min(healthy, key=lambda proxy: proxy.cost(default_latency))
+
+    def _check_ejection(self, proxy: ProxyEndpoint) -> None:
+        if proxy.ejected:
+            return
+        if (proxy.consecutive_failures >= self.eject_after_failures
+                or (proxy.requests >= 10 and proxy.ewma_errors > self.eject_error_rate)):
+            proxy.ejected_until = time.monotonic() + self.eject_seconds
+            logger.warning(f"Proxy {proxy.label} ejected for {self.eject_seconds:.0f}s "
+                           f"(error rate {proxy.ewma_errors:.2f}, {proxy.consecutive_failures} consecutive failures)")
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        """GET url through the best proxy, updating its health from the outcome."""
+        proxy = self.pick()
+        proxy.outstanding += 1
+        started = time.perf_counter()
+        try:
+            response = await proxy.client.get(url, **kwargs)
+        except httpx.TransportError:
+            proxy.record_failure()
+            self._check_ejection(proxy)
+            raise
+        finally:
+            proxy.outstanding -= 1
+        if response.status_code in PROXY_FAILURE_STATUSES:
+            proxy.record_failure()
+            self._check_ejection(proxy)
+        else:
+            proxy.record_success(time.perf_counter() - started)
+        return response
+
+    async def probe(self, proxy: ProxyEndpoint) -> bool:
+        """Any HTTP answer through the proxy counts as healthy."""
+        started = time.perf_counter()
+        try:
+            response = await proxy.client.get(self.probe_url, timeout=5.0)
+        except httpx.HTTPError as e:
+            logger.info(f"Proxy {proxy.label} probe failed: {type(e).__name__}")
+            proxy.ejected_until = time.monotonic() + self.eject_seconds
+            return False
+        if response.status_code in PROXY_FAILURE_STATUSES:
+            proxy.ejected_until = time.monotonic() + self.eject_seconds
+            return False
+        if proxy.ejected_until:
+            logger.info(f"Proxy {proxy.label} reinstated after probe")
+        proxy.ejected_until = 0.0
+        proxy.consecutive_failures = 0
+        proxy.ewma_errors = 0.0
+        proxy.record_success(time.perf_counter() - started)
+        return True
+
+    async def warm(self) -> int:
+        """Probe every proxy once, opening its first connection; returns how many answered."""
+        if not self.probe_url:
+            return len(self.proxies)
+        results = await asyncio.gather(*(self.probe(proxy) for proxy in self.proxies))
+        return sum(results)
+
+    async def run_probes(self) -> None:
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            ejected = [proxy for proxy in self.proxies if proxy.ejected]
+            if ejected:
+                await asyncio.gather(*(self.probe(proxy) for proxy in ejected), return_exceptions=True)
+
+    def start(self) -> None:
+        if self.probe_url and self._probe_task is None:
+            self._probe_task = asyncio.create_task(self.run_probes())
+
+    async def aclose(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+        await asyncio.gather(*(proxy.client.aclose() for proxy in self.proxies))
+
+    def stats(self) -> list[dict[str, Any]]:
+        return [proxy.stats() for proxy in self.proxies]
@@ -0,0 +1,270 @@
+from typing import Any
+from dataclasses import dataclass
+import math
+import operator
+import re
+
+# NumPy is optional (queries fall back to plain lists) and only imported by the first Snapshot
+np: Any = None
+_numpy_checked = False
+
+
+def load_numpy() -> None:
+    global np, _numpy_checked
+    if _numpy_checked:
+        return
+    _numpy_checked = True
+    try:
+        import numpy
+    except ImportError:
+        return
+    np = numpy
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# Literal suffixes: 50k, 1.5m, 2b are magnitudes; 30s, 15min, 24h, 7d, 2w are durations
+MAGNITUDES = {"k": 1e3, "m": 1e6, "b": 1e9}
+DURATIONS = {"s": 1, "sec": 1, "min": 60, "h": 3600, "d": 86400, "w": 604800}
+# Upstream ages look like "15m", "3h" or "2d 4h"; here a bare m means minutes
+AGE_UNITS = dict(DURATIONS, m=60)
+
+TOKEN_RE = re.compile(r'\s*(?:(?P<string>"[^"]*"|\'[^\']*\')|(?P<op>>=|<=|==|!=|>|<|=)|(?P<word>[^\s<>=!"\',]+)|(?P<comma>,))')
+LITERAL_RE = re.compile(r'^(-?\d+(?:\.\d+)?(?:e-?\d+)?)([a-z]*)$', re.IGNORECASE)
+AGE_PART_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([a-z]+)', re.IGNORECASE)
+
+
+class QueryError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Condition:
+    field: str
+    op: str
+    value: float | str
+    duration: bool = False
+
+
+def tokenize(expr: str) -> list[str]:
+    tokens = []
+    position = 0
+    expr = expr.strip()
+    while position < len(expr):
+        match = TOKEN_RE.match(expr, position)
+        if match is None or match.end() == position:
+            raise QueryError(f"Cannot parse query near: {expr[position:]!r}")
+        if match.group("string"):
+            tokens.append(match.group("string"))
+        else:
+            tokens.append(match.group("op") or match.group("word") or match.group("comma"))
+        position = match.end()
+    return tokens
+
+
+def unquote(token: str) -> str:
+    if len(token) >= 2 and token[0] == token[-1] and token[0] in "\"'":
+        return token[1:-1]
+    return token
+
+
+def parse_literal(token: str) -> tuple[float | str, bool]:
+    """Parse a literal into (value, is_duration); durations are in seconds."""
+    if token[0] in "\"'":
+        return unquote(token), False
+    match = LITERAL_RE.match(token)
+    if match is None:
+        return token, False
+    number, suffix = float(match.group(1)), match.group(2).lower()
+    if not suffix:
+        return number, False
+    if suffix in MAGNITUDES:
+        return number * MAGNITUDES[suffix], False
+    if suffix in DURATIONS:
+        return number * DURATIONS[suffix], True
+    raise QueryError(f"Unknown suffix in {token!r}")
+
+
+def parse_filter(expr: str | None, fields: list[str]) -> list[list[Condition]]:
+    """Parse "a > 1 and b < 2 or c == x" into OR-ed groups of AND-ed conditions."""
+    if not expr or not expr.strip():
+        return []
+    tokens = tokenize(expr)
+    groups: list[list[Condition]] = [[]]
+    index = 0
+    while True:
+        if index + 3 > len(tokens):
+            raise QueryError(f"Incomplete condition in filter: {expr!r}")
+        field, op, literal = unquote(tokens[index]), tokens[index + 1], tokens[index + 2]
+        op = "==" if op == "=" else op
+        if field not in fields:
+            raise QueryError(f"Unknown field {field!r}; expected one of: {', '.join(fields)}")
+        if op not in OPERATORS:
+            raise QueryError(f"Unknown operator {op!r}")
+        value, duration = parse_literal(literal)
+        if isinstance(value, str) and op not in ("==", "!="):
+            raise QueryError(f"Only == and != can compare text ({field} {op} {literal})")
+        groups[-1].append(Condition(field, op, value, duration))
+        index += 3
+        if index == len(tokens):
+            return groups
+        joiner = tokens[index].lower()
+        if joiner == "or":
+            groups.append([])
+        elif joiner != "and":
+            raise QueryError(f"Expected 'and' or 'or', got {tokens[index]!r}")
+        index += 1
+
+
+def parse_sort(expr: str | None, fields: list[str]) -> list[tuple[str, bool]]:
+    """Parse "score desc, liquidity_usd" into (field, descending) pairs."""
+    if not expr or not expr.strip():
+        return []
+    parts: list[list[str]] = [[]]
+    for token in tokenize(expr):
+        if token == ",":
+            parts.append([])
+        else:
+            parts[-1].append(token)
+    keys = []
+    for words in parts:
+        if not words:
+            continue
+        descending = False
+        if len(words) == 2 and words[1].lower() in ("asc", "desc"):
+            descending = words[1].lower() == "desc"
+        elif len(words) != 1:
+            raise QueryError(f"Cannot parse sort key: {' '.join(words)!r}")
+        field = unquote(words[0])
+        if field not in fields:
+            raise QueryError(f"Unknown sort field {field!r}; expected one of: {', '.join(fields)}")
+        keys.append((field, descending))
+    return keys
+
+
+def to_number(value: Any) -> float:
+    if isinstance(value, bool) or value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def to_seconds(value: Any) -> float:
+    """Convert an upstream age such as "2d 4h" to seconds (NaN if unparseable)."""
+    if not isinstance(value, str):
+        return math.nan
+    parts = AGE_PART_RE.findall(value)
+    if not parts or any(unit.lower() not in AGE_UNITS for _, unit in parts):
+        return math.nan
+    return sum(float(number) * AGE_UNITS[unit.lower()] for number, unit in parts)
+
+
+class Snapshot:
+    """Columnar view of projected token rows for filtering and sorting.
+
+    Columns are converted lazily (numeric, duration or text) and kept as
+    NumPy arrays when NumPy is installed, plain lists otherwise.
+    """
+
+    def __init__(self, rows: list[dict[str, Any]], columns: list[str]):
+        load_numpy()
+        self.rows = rows
+        self.columns = columns
+        self._raw = {column: [row.get(column) for row in rows] for column in columns}
+        self._converted: dict[tuple[str, str], Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def column(self, name: str, kind: str) -> Any:
+        key = (name, kind)
+        if key not in self._converted:
+            raw = self._raw[name]
+            if kind == "number":
+                values = [to_number(value) for value in raw]
+            elif kind == "duration":
+                values = [to_seconds(value) for value in raw]
+            else:
+                values = ["" if value is None else str(value) for value in raw]
+            if np is not None:
+                values = np.array(values, dtype=float if kind != "text" else object)
+            self._converted[key] = values
+        return self._converted[key]
+
+    def mask(self, condition: Condition) -> Any:
+        compare = OPERATORS[condition.op]
+        if isinstance(condition.value, str):
+            column = self.column(condition.field, "text")
+            if np is not None:
+                return np.asarray(compare(column, condition.value), dtype=bool)
+            return [compare(value, condition.value) for value in column]
+        column = self.column(condition.field, "duration" if condition.duration else "number")
+        # Missing values never match, including for !=
+        if np is not None:
+            return compare(column, condition.value) & ~np.isnan(column)
+        return [value == value and compare(value, condition.value) for value in column]
+
+    def filter(self, groups: list[list[Condition]]) -> Any:
+        """Indices of rows matching any group, where a group matches all its conditions."""
+        if not groups:
+            return np.arange(len(self.rows)) if np is not None else list(range(len(self.rows)))
+        if np is not None:
+            selected = np.zeros(len(self.rows), dtype=bool)
+            for group in groups:
+                group_mask = np.ones(len(self.rows), dtype=bool)
+                for condition in group:
+                    group_mask &= self.mask(condition)
+                selected |= group_mask
+            return np.flatnonzero(selected)
+        selected = [False] * len(self.rows)
+        for group in groups:
+            group_mask = [True] * len(self.rows)
+            for condition in group:
+                group_mask = [a and b for a, b in zip(group_mask, self.mask(condition))]
+            selected = [a or b for a, b in zip(selected, group_mask)]
+        return [index for index, keep in enumerate(selected) if keep]
+
+    def sort_key(self, field: str, descending: bool) -> Any:
+        """Numeric rank for field where smaller sorts first and missing values go last."""
+        numbers = self.column(field, "number")
+        if np is not None:
+            if np.isnan(numbers).all():
+                numbers = self.column(field, "duration")
+            if np.isnan(numbers).all():
+                # Text column: rank by sorted distinct values
+                _, numbers = np.unique(self.column(field, "text"), return_inverse=True)
+                numbers = numbers.astype(float)
+            key = -numbers if descending else numbers
+            return np.where(np.isnan(key), np.inf, key)
+        if all(value != value for value in numbers):
+            numbers = self.column(field, "duration")
+        if all(value != value for value in numbers):
+            ranks = {value: rank for rank, value in enumerate(sorted(set(self.column(field, "text"))))}
+            numbers = [float(ranks[value]) for value in self.column(field, "text")]
+        return [math.inf if value != value else (-value if descending else value) for value in numbers]
+
+    def query(self, filter_expr: str | None = None, sort_expr: str | None = None,
+              limit: int | None = None) -> tuple[list[dict[str, Any]], int]:
+        """The matching rows, sorted and cut to limit, and how many matched before the cut."""
+        indices = self.filter(parse_filter(filter_expr, self.columns))
+        matched = len(indices)
+        sort_keys = parse_sort(sort_expr, self.columns)
+        if sort_keys:
+            if np is not None:
+                # lexsort sorts by the last key first
+                keys = [self.sort_key(field, descending)[indices] for field, descending in reversed(sort_keys)]
+                indices = indices[np.lexsort(keys)]
+            else:
+                keys = [self.sort_key(field, descending) for field, descending in sort_keys]
+                indices = sorted(indices, key=lambda index: tuple(key[index] for key in keys))
+        if limit is not None:
+            indices = indices[:limit]
+        return [self.rows[index] for index in indices], matched
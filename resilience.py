@@ -0,0 +1,136 @@
+from collections import deque
+import random
+import time
+
+
+class LatencyTracker:
+    """Recent successful latencies, used to derive an adaptive timeout.
+
+    The timeout is the chosen percentile times a multiplier, clamped to
+    [min_timeout, max_timeout]; until min_samples are seen it is max_timeout.
+    """
+
+    def __init__(self, window: int = 200, percentile: float = 0.99, multiplier: float = 3.0,
+                 min_timeout: float = 2.0, max_timeout: float = 10.0, min_samples: int = 20):
+        self.samples: deque[float] = deque(maxlen=window)
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+
+    def record(self, latency: float) -> None:
+        self.samples.append(latency)
+
+    def quantile(self, q: float) -> float | None:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def timeout(self) -> float:
+        if len(self.samples) < self.min_samples:
+            return self.max_timeout
+        return min(max(self.quantile(self.percentile) * self.multiplier, self.min_timeout), self.max_timeout)
+
+
+class RetryBudget:
+    """Caps retries to a fraction of recent requests, shared by all endpoints.
+
+    Every first attempt deposits ratio tokens and the balance also refills at
+    min_per_second; a retry spends one token. This keeps retries from
+    multiplying load when the upstream is already struggling.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0, max_balance: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self.balance = max_balance
+        self.updated_at = time.monotonic()
+        self.exhausted = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.balance = min(self.max_balance, self.balance + (now - self.updated_at) * self.min_per_second)
+        self.updated_at = now
+
+    def deposit(self) -> None:
+        self._refill()
+        self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        self._refill()
+        if self.balance >= 1:
+            self.balance -= 1
+            return True
+        self.exhausted += 1
+        return False
+
+
+class CircuitBreaker:
+    """Per-endpoint breaker: closed -> open after consecutive failures -> half-open probe."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+        # Half-open: let a single probe through
+        if self.probe_in_flight:
+            return False
+        self.probe_in_flight = True
+        return True
+
+    def release_probe(self) -> None:
+        """Forget an abandoned half-open probe so another one may be sent."""
+        self.probe_in_flight = False
+
+    def retry_after(self) -> float:
+        if self.state != self.OPEN:
+            return 0.0
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+
+class EndpointGuard:
+    """Latency tracker and circuit breaker for one upstream endpoint."""
+
+    def __init__(self, latency: LatencyTracker, breaker: CircuitBreaker):
+        self.latency = latency
+        self.breaker = breaker
+
+    def record_success(self, latency: float) -> None:
+        self.latency.record(latency)
+        self.breaker.record_success()
+
+
+def backoff_delay(attempt: int, base: float = 0.2, cap: float = 2.0) -> float:
+    """Full-jitter exponential backoff before retry number attempt (1-based)."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
@@ -0,0 +1,202 @@
+from typing import Any
+from collections import OrderedDict, deque
+import asyncio
+import contextlib
+import time
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of queued or served."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows rate requests per second on average, with bursts of up to burst."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        return max(1 - self.tokens, 0.0) / self.rate
+
+
+class RateLimiter:
+    """One token bucket per client key, forgetting the least recently seen beyond max_clients.
+
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self.limited = 0
+
+    def check(self, client: str) -> None:
+        """Take a token for client or raise Overloaded with the time until the next one."""
+        if self.rate <= 0:
+            return
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(client)
+        if not bucket.try_acquire():
+            self.limited += 1
+            retry_after = bucket.retry_after()
+            raise Overloaded(f"Rate limit exceeded ({self.rate:g}/s, burst {self.burst:g})", retry_after)
+
+
+class SlotRequest:
+    """A pending request for one slot, which several clients may be waiting on.
+
+    It sits in the queue of every client it was joined for and is granted on
+    whichever of those clients' turns comes first.
+    """
+
+    def __init__(self):
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Client -> its entry in that client's queue
+        self.entries: dict[str, tuple["SlotRequest", int]] = {}
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+
+class FairScheduler:
+    """Caps concurrent work and hands free slots to waiting clients in weighted round-robin.
+
+    While all max_concurrency slots are busy, each client queues separately;
+    a client of weight w is granted up to w slots in a row before the next
+    waiting client's turn. A waiter is shed with Overloaded after max_wait
+    seconds, or straight away if its client already has max_queued waiting.
+    Work done for several clients at once (e.g. one shared fetch) can queue
+    under all of them with a SlotRequest and join().
+    """
+
+    def __init__(self, max_concurrency: int, max_wait: float = 5.0, max_queued: int = 50):
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.max_queued = max_queued
+        self.active = 0
+        self._queues: OrderedDict[str, deque[tuple[SlotRequest, int]]] = OrderedDict()
+        self._granted_in_turn: dict[str, int] = {}
+        self.shed = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def join(self, request: SlotRequest, client: str, weight: int = 1) -> bool:
+        """Also queue request under client; False if client's queue is full."""
+        if request.done or client in request.entries:
+            return True
+        queue = self._queues.setdefault(client, deque())
+        if len(queue) >= self.max_queued:
+            return False
+        entry = (request, max(weight, 1))
+        queue.append(entry)
+        request.entries[client] = entry
+        return True
+
+    async def acquire(self, client: str, weight: int = 1, request: SlotRequest | None = None) -> None:
+        """Take a slot, queueing for it under client (and whoever else request was joined for)."""
+        if self.active < self.max_concurrency and not self._queues:
+            self.active += 1
+            return
+        request = request or SlotRequest()
+        if not self.join(request, client, weight) and not request.entries:
+            self.shed += 1
+            raise Overloaded(f"Too many queued upstream requests for this client ({self.max_queued})")
+        # Slots may be free while other clients' requests were joined in
+        self._dispatch()
+        try:
+            await asyncio.wait_for(request.future, self.max_wait)
+        except asyncio.TimeoutError:
+            self._withdraw(request)
+            self.shed += 1
+            raise Overloaded(f"Upstream capacity busy; request shed after waiting {self.max_wait:g}s",
+                             self.max_wait) from None
+        except asyncio.CancelledError:
+            if request.future.done() and not request.future.cancelled():
+                # Granted just as the caller went away: hand the slot on
+                self.release()
+            else:
+                self._withdraw(request)
+            raise
+
+    def release(self) -> None:
+        self.active -= 1
+        self._dispatch()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, client: str, weight: int = 1, request: SlotRequest | None = None):
+        await self.acquire(client, weight, request)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _discard(self, client: str, entry: tuple[SlotRequest, int]) -> None:
+        queue = self._queues.get(client)
+        if queue is None:
+            return
+        with contextlib.suppress(ValueError):
+            queue.remove(entry)
+        if not queue:
+            del self._queues[client]
+            self._granted_in_turn.pop(client, None)
+
+    def _withdraw(self, request: SlotRequest) -> None:
+        """Remove request from every queue it still sits in."""
+        for client, entry in request.entries.items():
+            self._discard(client, entry)
+        request.entries.clear()
+
+    def _dispatch(self) -> None:
+        while self.active < self.max_concurrency and self._queues:
+            client, queue = next(iter(self._queues.items()))
+            request, weight = queue.popleft()
+            if not queue:
+                del self._queues[client]
+                self._granted_in_turn.pop(client, None)
+            else:
+                granted = self._granted_in_turn.get(client, 0) + 1
+                if granted >= weight:
+                    # Turn over: this client goes to the back of the rotation
+                    self._queues.move_to_end(client)
+                    granted = 0
+                self._granted_in_turn[client] = granted
+            request.entries.pop(client, None)
+            if request.done:
+                continue
+            self._withdraw(request)
+            request.future.set_result(None)
+            self.active += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queued": self.queued,
+            "queued_clients": len(self._queues),
+            "shed": self.shed,
+        }
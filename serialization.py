@@ -0,0 +1,75 @@
+from typing import Any
+import json
+
+# Fastest installed JSON library: orjson, then msgspec, then the stdlib
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # optional
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = "orjson"
+elif msgspec is not None:
+    BACKEND = "msgspec"
+else:
+    BACKEND = "json"
+
+_msgspec_encoder = msgspec.json.Encoder() if msgspec is not None else None
+_msgspec_decoder = msgspec.json.Decoder() if msgspec is not None else None
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    if _msgspec_decoder is not None:
+        return _msgspec_decoder.decode(data)
+    return json.loads(data)
+
+
+def dumps(value: Any) -> str:
+    """Compact JSON text; every backend produces the same output for plain data."""
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    if _msgspec_encoder is not None:
+        return _msgspec_encoder.encode(value).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class PageDecoder:
+    """Decodes an upstream page keeping only list_key and the given token fields.
+
+    With msgspec installed the body is decoded straight into structs that
+    declare just those fields, so the rest of each token is skipped instead
+    of being built and discarded. Without msgspec, or if a page does not have
+    the expected shape, it falls back to a full decode.
+    """
+
+    def __init__(self, list_key: str, fields: list[str]):
+        self.list_key = list_key
+        self.fields = list(dict.fromkeys(fields))
+        self._decoder = None
+        if msgspec is not None:
+            token_type = msgspec.defstruct(
+                "Token", [(field, Any, None) for field in self.fields])
+            page_type = msgspec.defstruct(
+                "Page", [(list_key, list[token_type] | None, None)])
+            self._decoder = msgspec.json.Decoder(page_type)
+
+    @property
+    def typed(self) -> bool:
+        return self._decoder is not None
+
+    def decode(self, data: bytes) -> dict[str, Any]:
+        if self._decoder is None:
+            return loads(data)
+        try:
+            page = self._decoder.decode(data)
+        except msgspec.ValidationError:
+            return loads(data)
+        tokens = getattr(page, self.list_key) or []
+        return {self.list_key: [msgspec.structs.asdict(token) for token in tokens]}
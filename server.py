@@ -1,20 +1,27 @@
-from typing import Any
+from typing import Any, Awaitable, Callable
+from dataclasses import dataclass
 import asyncio
-import requests
+import contextlib
+import contextvars
+import importlib.util
+import anyio
+import httpx
 from mcp.server.models import InitializationOptions
 import mcp.types as types
 from mcp.server import NotificationOptions, Server
 from mcp.server.sse import SseServerTransport
 from starlette.applications import Starlette
+from starlette.middleware import Middleware
 from starlette.routing import Route, Mount
 from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
 import urllib.parse
-import json
-import uvicorn
+import uuid
+import math
 import logging
-from datetime import datetime
-import os
-from dotenv import load_dotenv
+import itertools
+import time
+from datetime import datetime, timezone
 from mcp.types import (
     GetPromptResult,
     Prompt,
@@ -26,35 +33,258 @@ from mcp.types import (
     INTERNAL_ERROR,
 )
 from mcp.shared.exceptions import McpError
-load_dotenv()
+from mcp.types import ErrorData
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+from cache import Aged, CacheEntry, ResponseCache
+from prefetch import Prefetcher
+from projection import Projection
+from formats import FORMATS, fit_rows
+from token_index import TokenIndex
+from query import QueryError, Snapshot, to_seconds
+from metrics import Registry
+from proxy_pool import DIRECT, ProxyPool, proxy_label
+from scheduling import FairScheduler, Overloaded, RateLimiter, SlotRequest
+from sessions import SessionRegistry, StreamEnd
+from compression import CompressionMiddleware
+from serialization import PageDecoder, dumps, loads
+from resilience import CircuitBreaker, EndpointGuard, LatencyTracker, RetryBudget, backoff_delay
+from history import METRICS, HistoryStore
+from watch import Threshold, WatchHub, diff_rows
+from workers import WorkerTopology
+from peers import PEER_CLIENT_HEADER, PeerClient
+from settings import load_settings
+from logconfig import setup_logging
+from startup import Readiness, profile
 
-API_BASE = "portal.boltrade.ai"
+settings = load_settings()
+logger = logging.getLogger('boltrade_api')
+
+UPSTREAM_BASE_URL = settings.upstream_base_url.rstrip('/')
 
 server = Server("gems-api")
-sse = SseServerTransport("/messages/")
+# Set when running as one of several worker processes (see main.py)
+topology = WorkerTopology.from_env()
+peers = PeerClient(topology) if topology.enabled else None
+sse = SseServerTransport(topology.messages_path)
 
-def setup_logging():
-    """Configure logging settings"""
-    # Create logs directory if it doesn't exist
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-        
-    # Generate log filename with timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    log_file = f'logs/boltrade_api_{timestamp}.log'
-    
-    # Configure logging format
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s [%(levelname)s] %(message)s',
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
-            logging.StreamHandler()  
-        ]
+TOP_SCORE_ENDPOINT = "top_score"
+SMART_MONEY_ENDPOINT = "smart_money_new_listing_buy"
+
+@dataclass(frozen=True)
+class FindgemsTool:
+    """A tool backed by one findgems endpoint."""
+    endpoint: str
+    frame: str
+    list_key: str
+    address_key: str
+    projection: Projection
+    error_text: str
+    # Output field compared against WATCH_PRICE_CHANGE when diffing watched lists
+    price_field: str
+    # History store metric -> upstream token field recorded for it
+    history_fields: dict[str, str]
+    # Bytes of result text allowed (0: unlimited), and the fields given up first to fit
+    max_bytes: int
+    drop_order: tuple[str, ...]
+
+FINDGEMS_TOOLS = {
+    "get-sol-top-score-list": FindgemsTool(
+        endpoint=TOP_SCORE_ENDPOINT,
+        frame="30d",
+        list_key="users",
+        address_key="token_address",
+        projection=Projection([
+            ("usd_price", "usd_price"),
+            ("CA address", "token_address"),
+            ("symbol", "symbol"),
+            ("volume_h24", "volume_h24"),
+            ("fdv", "fdv"),
+            ("market_cap", "market_cap"),
+            ("price_change_h24", "price_change_h24"),
+            ("liquidity_usd", "liquidity_usd"),
+            ("score", "score"),
+            ("token_age", "token_age"),
+        ]),
+        error_text="Failed to retrieve gems data",
+        price_field="usd_price",
+        history_fields={
+            "price": "usd_price", "score": "score", "liquidity": "liquidity_usd",
+            "market_cap": "market_cap", "fdv": "fdv", "volume": "volume_h24",
+        },
+        max_bytes=(settings.result_max_bytes if settings.result_max_bytes_top_score is None
+                   else settings.result_max_bytes_top_score),
+        drop_order=("token_age", "fdv", "price_change_h24"),
+    ),
+    "get-sol-smart-money-listing": FindgemsTool(
+        endpoint=SMART_MONEY_ENDPOINT,
+        frame="1d",
+        list_key="smart_money_new_listing_buy",
+        address_key="address",
+        projection=Projection([
+            ("CA address", "address"),
+            ("symbol", "symbol"),
+            ("current_price", "current_price"),
+            ("pnl", "pnl"),
+            ("token_age", "token_age"),
+            ("avg_price", "avg_price"),
+            ("price_change_24h", "price_change_24h"),
+            ("NumberOfSmartMoney", "NumberOfSmartMoney"),
+            ("usdt_value", "usdt_value"),
+            ("total_spent", "total_spent"),
+            ("liquidity", "liquidity"),
+            ("market_cap", "market_cap"),
+            ("fdv", "fdv"),
+            ("score", "score"),
+            ("risk", "risk"),
+            ("websites", "websites"),
+            ("telegram_handle", "telegram_handle"),
+            ("twitter_handle", "twitter_handle"),
+            ("discord_url", "discord_url"),
+        ]),
+        error_text="Failed to retrieve smart money data",
+        price_field="current_price",
+        history_fields={
+            "price": "current_price", "score": "score", "liquidity": "liquidity",
+            "market_cap": "market_cap", "fdv": "fdv", "volume": "usdt_value",
+        },
+        max_bytes=(settings.result_max_bytes if settings.result_max_bytes_smart_money is None
+                   else settings.result_max_bytes_smart_money),
+        drop_order=("discord_url", "telegram_handle", "twitter_handle", "websites",
+                    "total_spent", "avg_price", "token_age"),
+    ),
+}
+
+TOOLS_BY_ENDPOINT = {tool.endpoint: name for name, tool in FINDGEMS_TOOLS.items()}
+
+# Upstream pages are decoded keeping only the fields some projection (or the index) reads
+PAGE_DECODERS = {
+    tool.endpoint: PageDecoder(
+        tool.list_key,
+        [source_key for _, source_key in tool.projection.fields] + [tool.address_key]
+        + list(tool.history_fields.values()),
     )
-    return logging.getLogger('boltrade_api')
+    for tool in FINDGEMS_TOOLS.values()
+}
+
+TOKENS_BY_ADDRESS_TOOL = "get-sol-tokens-by-address"
+LOOKUP_MAX_ADDRESSES = settings.lookup_max_addresses
+# Pages of each list scanned for addresses missing from the index
+LOOKUP_MAX_PAGES = settings.lookup_max_pages
+TOKEN_INDEX_MAX_AGE = settings.token_index_max_age
+
+token_index = TokenIndex(max_entries=settings.token_index_max_entries)
+
+QUERY_TOKENS_TOOL = "query-sol-tokens"
+# Pages of the queried list refreshed (through the cache) before each query
+QUERY_SNAPSHOT_PAGES = settings.query_snapshot_pages
+# Columnar snapshots per source list, rebuilt when the token index changes
+query_snapshots: dict[str, tuple[int, Snapshot]] = {}
+
+TOKEN_HISTORY_TOOL = "get-sol-token-history"
+TOP_MOVERS_TOOL = "get-sol-top-movers"
+HISTORY_MAX_POINTS = 1000
+WINDOW_SCHEMA = {
+    "type": "string",
+    "description": "How far back to look, e.g. 30min, 6h, 2d",
+    "default": "6h"
+}
+# Every page fetched from upstream is recorded here for history queries
+HISTORY_ENABLED = settings.history_enabled
+history_store = HistoryStore(
+    settings.history_path,
+    flush_interval=settings.history_flush_interval,
+    retention=settings.history_retention_days * 86400,
+    downsample_after=settings.history_downsample_after_hours * 3600,
+    bucket=settings.history_downsample_bucket_minutes * 60,
+)
+
+WATCH_TOOL = "watch-sol-tokens"
+WATCH_URI_PREFIX = "boltrade://watch/"
+# Pages of a watched list that are polled and diffed
+WATCH_PAGES = settings.watch_pages
+WATCH_PRICE_CHANGE = settings.watch_price_change
+WATCH_SCORE_CHANGE = settings.watch_score_change
+WATCH_MIN_RANK_MOVE = settings.watch_min_rank_move
+# Seconds between polls of a watched list; defaults to the list's cache TTL
+WATCH_INTERVAL = settings.watch_interval
+
+# Metrics are only collected (and /metrics only mounted) when METRICS_ENABLED=true
+METRICS_ENABLED = settings.metrics_enabled
+metrics = Registry(enabled=METRICS_ENABLED)
+TOOL_CALL_SECONDS = metrics.histogram(
+    "boltrade_tool_call_seconds", "Tool call latency", ("tool",))
+TOOL_STAGE_SECONDS = metrics.histogram(
+    "boltrade_tool_stage_seconds", "Tool call latency by stage (fetch, projection, serialization)", ("tool", "stage"))
+UPSTREAM_SECONDS = metrics.histogram(
+    "boltrade_upstream_seconds", "Upstream request latency by stage (wait, decode)", ("endpoint", "stage"))
+UPSTREAM_RESPONSES = metrics.counter(
+    "boltrade_upstream_responses_total", "Upstream responses by HTTP status", ("endpoint", "status"))
+UPSTREAM_ERRORS = metrics.counter(
+    "boltrade_upstream_errors_total", "Failed upstream requests by error type", ("endpoint", "error"))
+SHED_REQUESTS = metrics.counter(
+    "boltrade_shed_requests_total", "Tool calls rejected by the rate limiter or upstream queue", ("tool",))
+TRIMMED_RESULTS = metrics.counter(
+    "boltrade_trimmed_results_total", "Tool results trimmed to fit their byte budget", ("tool",))
+UPSTREAM_RETRIES = metrics.counter(
+    "boltrade_upstream_retries_total", "Upstream retries", ("endpoint",))
+inflight_upstream_requests = 0
+
+# Upstream pages are fixed at 10 tokens; larger limits are split across pages
+UPSTREAM_PAGE_SIZE = 10
+MAX_RESULT_LIMIT = settings.max_result_limit
+PAGE_FETCH_CONCURRENCY = settings.page_fetch_concurrency
+
+# Default significant digits for numbers in tool output (unset: no rounding)
+OUTPUT_PRECISION = settings.output_precision
+
+FORMAT_SCHEMA = {
+    "type": "string",
+    "description": "Output format: json (list of objects), columnar (header row plus value arrays) or csv",
+    "enum": list(FORMATS),
+    "default": "json"
+}
+
+PRECISION_SCHEMA = {
+    "type": "integer",
+    "description": "Round numbers to this many significant digits",
+    "minimum": 1,
+    "maximum": 17
+}
 
-logger = setup_logging()
+MAX_BYTES_SCHEMA = {
+    "type": "integer",
+    "description": "Byte budget for the result text; fields and then rows are dropped to fit (can only lower the server's limit)",
+    "minimum": 1
+}
+
+def fields_schema(tool_name: str) -> dict[str, Any]:
+    return {
+        "type": "array",
+        "description": "Optional subset of output fields to return (default: all)",
+        "items": {"type": "string", "enum": FINDGEMS_TOOLS[tool_name].projection.output_keys},
+    }
+
+response_cache = ResponseCache(
+    max_entries=settings.cache_max_entries,
+    ttls={
+        TOP_SCORE_ENDPOINT: settings.cache_ttl_top_score,
+        SMART_MONEY_ENDPOINT: settings.cache_ttl_smart_money,
+    },
+    max_stale=settings.cache_max_stale,
+)
+
+# Upstream body dumps: log 1 in LOG_BODY_SAMPLE_RATE bodies (0 disables), truncated to LOG_BODY_MAX_BYTES
+LOG_BODY_SAMPLE_RATE = settings.log_body_sample_rate
+LOG_BODY_MAX_BYTES = settings.log_body_max_bytes
+_body_log_counter = itertools.count()
+
+def should_log_body() -> bool:
+    return LOG_BODY_SAMPLE_RATE > 0 and next(_body_log_counter) % LOG_BODY_SAMPLE_RATE == 0
+
+def truncate_body(text: str) -> str:
+    if len(text) <= LOG_BODY_MAX_BYTES:
+        return text
+    return f"{text[:LOG_BODY_MAX_BYTES]}... [truncated {len(text) - LOG_BODY_MAX_BYTES} chars]"
 
 @server.list_tools()
 async def handle_list_tools() -> list[types.Tool]:
@@ -62,7 +292,7 @@ async def handle_list_tools() -> list[types.Tool]:
     List available tools.
     Each tool specifies its arguments using JSON Schema validation.
     """
-    return [
+    tools = [
         types.Tool(
             name="get-sol-top-score-list",
             description="get solana tokens top scoring cryptocurrency list ,must contain CA address price and symbol and volume_h24 and market_cap and liquidity_usd and score and token_age ",
@@ -71,17 +301,21 @@ async def handle_list_tools() -> list[types.Tool]:
                 "properties": {
                     "limit": {
                         "type": "integer",
-                        "description": "Number of results to return",
+                        "description": f"Number of results to return (fetched in pages of {UPSTREAM_PAGE_SIZE})",
                         "minimum": 1,
-                        "maximum": 10,
+                        "maximum": MAX_RESULT_LIMIT,
                         "default": 10
                     },
                     "start": {
                         "type": "integer",
-                        "description": "Starting position for pagination",
+                        "description": "Starting page for pagination",
                         "minimum": 1,
                         "default": 1
-                    }
+                    },
+                    "fields": fields_schema("get-sol-top-score-list"),
+                    "format": FORMAT_SCHEMA,
+                    "precision": PRECISION_SCHEMA,
+                    "max_bytes": MAX_BYTES_SCHEMA,
                     # "chain": {
                     #     "type": "string",
                     #     "description": "Blockchain to filter results",
@@ -105,17 +339,21 @@ async def handle_list_tools() -> list[types.Tool]:
                 "properties": {
                     "limit": {
                         "type": "integer",
-                        "description": "Number of results to return",
+                        "description": f"Number of results to return (fetched in pages of {UPSTREAM_PAGE_SIZE})",
                         "minimum": 1,
-                        "maximum": 10,
+                        "maximum": MAX_RESULT_LIMIT,
                         "default": 10
                     },
                     "start": {
                         "type": "integer",
-                        "description": "Starting position for pagination",
+                        "description": "Starting page for pagination",
                         "minimum": 1,
                         "default": 1
-                    }
+                    },
+                    "fields": fields_schema("get-sol-smart-money-listing"),
+                    "format": FORMAT_SCHEMA,
+                    "precision": PRECISION_SCHEMA,
+                    "max_bytes": MAX_BYTES_SCHEMA,
                     # "chain": {
                     #     "type": "string",
                     #     "description": "Blockchain to filter results",
@@ -161,8 +399,184 @@ async def handle_list_tools() -> list[types.Tool]:
             #     }
             # }
              #    "image_url": {"type": "string"},
+        ),
+        types.Tool(
+            name=TOKENS_BY_ADDRESS_TOOL,
+            description="look up solana tokens by contract (CA) address, answered from recently fetched top score and smart money lists",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "addresses": {
+                        "type": "array",
+                        "description": "Token contract (CA) addresses",
+                        "items": {"type": "string"},
+                        "minItems": 1,
+                        "maxItems": LOOKUP_MAX_ADDRESSES
+                    },
+                    "max_age": {
+                        "type": "integer",
+                        "description": "Refetch tokens last seen more than this many seconds ago",
+                        "minimum": 0,
+                        "default": int(TOKEN_INDEX_MAX_AGE)
+                    },
+                    "max_bytes": MAX_BYTES_SCHEMA,
+                },
+                "required": ["addresses"]
+            }
+        ),
+        types.Tool(
+            name=QUERY_TOKENS_TOOL,
+            description=(
+                "filter and sort solana tokens server-side over recently fetched lists. "
+                "filter example: liquidity_usd > 50k and token_age < 24h or risk == low. "
+                "sort example: score desc, market_cap"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "source": {
+                        "type": "string",
+                        "description": "List to query",
+                        "enum": list(FINDGEMS_TOOLS),
+                        "default": "get-sol-top-score-list"
+                    },
+                    "filter": {
+                        "type": "string",
+                        "description": (
+                            "Conditions 'field op value' joined by and/or (and binds tighter). "
+                            "Operators: > >= < <= == !=. Numbers take k/m/b suffixes; "
+                            "durations (s, min, h, d, w) compare against token_age"
+                        )
+                    },
+                    "sort": {
+                        "type": "string",
+                        "description": "Comma-separated fields, each optionally followed by asc or desc"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of results",
+                        "minimum": 1,
+                        "maximum": MAX_RESULT_LIMIT,
+                        "default": 20
+                    },
+                    "fields": {
+                        "type": "array",
+                        "description": "Optional subset of output fields to return (default: all fields of the source list)",
+                        "items": {"type": "string"}
+                    },
+                    "format": FORMAT_SCHEMA,
+                    "precision": PRECISION_SCHEMA,
+                    "max_bytes": MAX_BYTES_SCHEMA,
+                }
+            }
+        ),
+        types.Tool(
+            name=TOKEN_HISTORY_TOOL,
+            description=(
+                "history of a solana token's rank, price, score, liquidity, market cap, fdv and volume, "
+                "from snapshots recorded by this server (no upstream call)"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "address": {
+                        "type": "string",
+                        "description": "Token contract (CA) address"
+                    },
+                    "source": {
+                        "type": "string",
+                        "description": "Only snapshots from this list (default: both)",
+                        "enum": list(FINDGEMS_TOOLS)
+                    },
+                    "window": WINDOW_SCHEMA,
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of snapshots (the most recent are kept)",
+                        "minimum": 1,
+                        "maximum": HISTORY_MAX_POINTS,
+                        "default": 100
+                    },
+                    "format": FORMAT_SCHEMA,
+                    "precision": PRECISION_SCHEMA,
+                    "max_bytes": MAX_BYTES_SCHEMA,
+                },
+                "required": ["address"]
+            }
+        ),
+        types.Tool(
+            name=TOP_MOVERS_TOOL,
+            description=(
+                "solana tokens whose score, price, liquidity, market cap, fdv or volume moved most "
+                "over a recent window, from snapshots recorded by this server (no upstream call)"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "source": {
+                        "type": "string",
+                        "description": "List the snapshots came from",
+                        "enum": list(FINDGEMS_TOOLS),
+                        "default": "get-sol-top-score-list"
+                    },
+                    "metric": {
+                        "type": "string",
+                        "enum": list(METRICS),
+                        "default": "score"
+                    },
+                    "window": WINDOW_SCHEMA,
+                    "change": {
+                        "type": "string",
+                        "description": "Rank by relative (pct_change) or absolute change",
+                        "enum": ["relative", "absolute"],
+                        "default": "relative"
+                    },
+                    "direction": {
+                        "type": "string",
+                        "enum": ["up", "down", "both"],
+                        "default": "both"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": MAX_RESULT_LIMIT,
+                        "default": 10
+                    },
+                    "format": FORMAT_SCHEMA,
+                    "precision": PRECISION_SCHEMA,
+                    "max_bytes": MAX_BYTES_SCHEMA,
+                }
+            }
+        ),
+        types.Tool(
+            name=WATCH_TOOL,
+            description=(
+                "subscribe to changes of a solana token list instead of polling it. "
+                "returns the current list; new tokens, rank moves and price/score changes are then "
+                "pushed as notifications/resources/updated with a changes field"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "source": {
+                        "type": "string",
+                        "description": "List to watch",
+                        "enum": list(FINDGEMS_TOOLS),
+                        "default": "get-sol-smart-money-listing"
+                    },
+                    "action": {
+                        "type": "string",
+                        "enum": ["subscribe", "unsubscribe"],
+                        "default": "subscribe"
+                    },
+                    "max_bytes": MAX_BYTES_SCHEMA,
+                }
+            }
         )
     ]
+    if not HISTORY_ENABLED:
+        # Nothing is recorded, so there is no history to answer from
+        tools = [tool for tool in tools if tool.name not in (TOKEN_HISTORY_TOOL, TOP_MOVERS_TOOL)]
+    return tools
 
 
 # @server.list_prompts()
@@ -226,307 +640,1171 @@ async def handle_list_tools() -> list[types.Tool]:
 #         )
 #     ]
 
-def make_boltrade_request(url: str) -> dict[str, Any] | None:
-    """Make a request to the Boltrade API with proper error handling."""
-    headers = {
-        'Accept': 'application/json, text/plain, */*',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-        'Origin': 'https://app.boltrade.ai',
-        'Referer': 'https://app.boltrade.ai/',
-    }
+UPSTREAM_HEADERS = {
+    'Accept': 'application/json, text/plain, */*',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+    'Origin': 'https://app.boltrade.ai',
+    'Referer': 'https://app.boltrade.ai/',
+}
+
+# Shared upstream proxy pool, created on app startup and closed on shutdown
+upstream_pool: ProxyPool | None = None
+
+def create_http_client(proxy_url: str) -> httpx.AsyncClient:
+    """Create the pooled async client used for Boltrade API calls through one proxy."""
+    limits = httpx.Limits(
+        max_connections=settings.upstream_max_connections,
+        max_keepalive_connections=settings.upstream_max_keepalive,
+        keepalive_expiry=settings.upstream_keepalive_expiry,
+    )
+    # HTTP/2 needs the optional h2 package (pip install httpx[http2])
+    http2 = importlib.util.find_spec('h2') is not None
+
+    logger.info(f"Using proxy: {proxy_label(proxy_url)} (http2={http2}, "
+                f"max_connections={limits.max_connections}, "
+                f"max_keepalive={limits.max_keepalive_connections})")
+    return httpx.AsyncClient(
+        headers=UPSTREAM_HEADERS,
+        proxy=None if proxy_url == DIRECT else proxy_url,
+        limits=limits,
+        http2=http2,
+        timeout=settings.upstream_timeout,
+        verify=False  # Disable SSL verification
+    )
+
+def proxy_urls_from_env() -> list[str]:
+    """Proxy URLs from PROXY_URLS (comma-separated, "direct" for none), else the single PROXY_* proxy."""
+    proxy_urls = [url.strip() for url in settings.proxy_urls.split(',') if url.strip()]
+    if proxy_urls:
+        return proxy_urls
 
     # Load proxy configuration from environment variables
-    username = os.getenv('PROXY_USERNAME')
-    password = os.getenv('PROXY_PASSWORD')
-    proxy_host = os.getenv('PROXY_HOST')
-    proxy_port = os.getenv('PROXY_PORT')
-    
+    username = settings.proxy_username
+    password = settings.proxy_password
+    proxy_host = settings.proxy_host
+    proxy_port = settings.proxy_port
+
     if not all([username, password, proxy_host, proxy_port]):
+        return []
+    return [f'http://{username}:{password}@{proxy_host}:{proxy_port}']
+
+def create_proxy_pool() -> ProxyPool | None:
+    """Read the proxy configuration once and open a client per proxy."""
+    proxy_urls = proxy_urls_from_env()
+    if not proxy_urls:
         logger.error("Missing proxy configuration in environment variables")
         return None
-    
-    proxies = {
-        'http': f'http://{username}:{password}@{proxy_host}:{proxy_port}',
-        'https': f'http://{username}:{password}@{proxy_host}:{proxy_port}'
-    }
-        
-    logger.info("="*100)
-    logger.info("BOLTRADE API REQUEST111:")
-    logger.info("="*100)
-    logger.info(f"URL: {url}")
-    logger.info("Headers:")
-    for key, value in headers.items():
-        logger.info(f"{key}: {value}")
-    logger.info(f"Using proxy: {proxy_host}:{proxy_port}")
-    
-    try:
-        response = requests.get(
-            url, 
-            headers=headers,
-            proxies=proxies,
-            timeout=10,
-            verify=False  # Disable SSL verification
+    return ProxyPool(
+        proxy_urls,
+        client_factory=create_http_client,
+        strategy=settings.proxy_balancing,
+        eject_after_failures=settings.proxy_eject_after_failures,
+        eject_error_rate=settings.proxy_eject_error_rate,
+        eject_seconds=settings.proxy_eject_seconds,
+        probe_url=f"{UPSTREAM_BASE_URL}/",
+        probe_interval=settings.proxy_probe_interval,
+    )
+
+# Resilience: adaptive per-endpoint timeouts, a shared retry budget and per-endpoint breakers
+UPSTREAM_MAX_ATTEMPTS = settings.upstream_max_attempts
+retry_budget = RetryBudget(
+    ratio=settings.retry_budget_ratio,
+    min_per_second=settings.retry_budget_min_per_second,
+)
+upstream_guards: dict[str, EndpointGuard] = {}
+
+def upstream_guard(endpoint: str) -> EndpointGuard:
+    guard = upstream_guards.get(endpoint)
+    if guard is None:
+        guard = upstream_guards[endpoint] = EndpointGuard(
+            LatencyTracker(
+                multiplier=settings.upstream_timeout_multiplier,
+                min_timeout=settings.upstream_timeout_min,
+                max_timeout=settings.upstream_timeout,
+            ),
+            CircuitBreaker(
+                failure_threshold=settings.breaker_failure_threshold,
+                reset_timeout=settings.breaker_reset_timeout,
+            ),
         )
+    return guard
+
+# Per-client rate limit on tool calls (RATE_LIMIT_PER_SECOND=0 disables it)
+RATE_LIMIT_KEY = settings.rate_limit_key  # session or ip
+rate_limiter = RateLimiter(
+    rate=settings.rate_limit_per_second,
+    burst=settings.rate_limit_burst,
+)
+# Cap on this worker's concurrent upstream requests, shared fairly between clients
+upstream_scheduler = FairScheduler(
+    max_concurrency=settings.upstream_concurrency,
+    max_wait=settings.upstream_queue_timeout,
+    max_queued=settings.upstream_queue_per_client,
+)
+# Prefetch and watch polling serve every client, so they get a larger share
+BACKGROUND_CLIENT = "background"
+UPSTREAM_BACKGROUND_WEIGHT = settings.upstream_background_weight
+# JSON-RPC server error code for shed requests
+SERVER_BUSY = -32000
+# Client identity of the current SSE connection (background tasks keep the default)
+current_client: contextvars.ContextVar[str] = contextvars.ContextVar("current_client", default=BACKGROUND_CLIENT)
+_connection_ids = itertools.count(1)
+# Clients waiting on each cache key's fetch. A fetch is shared by everyone
+# who asked for the page, so it queues for a slot under all of them, not
+# under whichever client happened to start it.
+fetch_waiters: dict[tuple, dict[str, int]] = {}
+# Slot requests of fetches still waiting for the scheduler, by cache key
+queued_fetches: dict[tuple, SlotRequest] = {}
+# Clients each in-flight peer page request already speaks for, by cache key
+peer_fetch_clients: dict[tuple, set[str]] = {}
+_peer_joins: set[asyncio.Task] = set()
+
+def client_weight(client: str) -> int:
+    return UPSTREAM_BACKGROUND_WEIGHT if client == BACKGROUND_CLIENT else 1
+
+def client_key(request: Request) -> str:
+    if RATE_LIMIT_KEY == 'ip' and request.client is not None:
+        return f"ip:{request.client.host}"
+    # Client keys travel to other workers with page requests, so they must not collide across workers
+    if topology.enabled:
+        return f"session:{topology.index}-{next(_connection_ids)}"
+    return f"session:{next(_connection_ids)}"
+
+def busy_error(e: Overloaded) -> McpError:
+    # mcp 1.3.0 reports tool errors as an isError result with only the message, so it carries retry_after too
+    return McpError(ErrorData(code=SERVER_BUSY, message=f"Server busy: {e}; retry after {e.retry_after:.1f}s",
+                              data={"retry_after": round(e.retry_after, 1)}))
+
+def is_retryable(error: Exception) -> bool:
+    """Transport errors, timeouts, 429 and 5xx are worth retrying; other errors are not."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+async def request_once(url: str, endpoint: str, guard: EndpointGuard) -> tuple[dict[str, Any] | None, bool]:
+    """Make one upstream attempt, returning (data, retryable) and updating the guard."""
+    global inflight_upstream_requests
+    timeout = guard.latency.timeout()
+    inflight_upstream_requests += 1
+    started = time.perf_counter()
+    try:
+        response = await upstream_pool.get(url, timeout=timeout)
+        received = time.perf_counter()
+        UPSTREAM_SECONDS.observe(received - started, endpoint=endpoint, stage="wait")
+        UPSTREAM_RESPONSES.inc(endpoint=endpoint, status=response.status_code)
         response.raise_for_status()
-        response_data = response.json()
-
-        logger.info("="*100)
-        logger.info("BOLTRADE API RESPONSE:")
-        logger.info("="*100)
-        logger.info(f"Status Code: {response.status_code}")
-        logger.info("Response Headers:")
-        for key, value in response.headers.items():
-            logger.info(f"{key}: {value}")
-        
-        logger.info("Response Body:")
-        logger.info("-"*100)
-        logger.info(json.dumps(response_data, indent=2, ensure_ascii=False))
-        logger.info("-"*100)
+        response_data = PAGE_DECODERS[endpoint].decode(response.content)
+        UPSTREAM_SECONDS.observe(time.perf_counter() - received, endpoint=endpoint, stage="decode")
+        guard.record_success(received - started)
+
+        logger.info("BOLTRADE API RESPONSE: %s %s (%s) in %.1fms",
+                    response.status_code, url, response.http_version,
+                    (received - started) * 1000)
+        logger.debug("Response Headers: %s", response.headers)
+        if should_log_body():
+            logger.info("Response Body: %s", truncate_body(response.text))
         
-        return response_data
+        return response_data, False
     except Exception as e:
-        logger.error("="*100)
-        logger.error("BOLTRADE API ERROR:")
-        logger.error("="*100)
-        logger.error(f"Error Type: {type(e).__name__}")
-        logger.error(f"Error Message: {str(e)}")
-        if hasattr(e, 'response'):
-            logger.error(f"Error Response Status: {e.response.status_code}")
-            logger.error("Error Response Headers:")
-            for key, value in e.response.headers.items():
-                logger.error(f"{key}: {value}")
-            try:
-                error_body = e.response.json()
-                logger.error("Error Response Body:")
-                logger.error(json.dumps(error_body, indent=2, ensure_ascii=False))
-            except:
-                logger.error("Error Response Body:")
-                logger.error(e.response.text)
+        UPSTREAM_ERRORS.inc(endpoint=endpoint, error=type(e).__name__)
+        logger.error("BOLTRADE API ERROR: %s %s: %s (after %.1fms, timeout %.1fs)",
+                     url, type(e).__name__, e, (time.perf_counter() - started) * 1000, timeout)
+        if isinstance(e, httpx.HTTPStatusError):
+            logger.error("Error Response Status: %s", e.response.status_code)
+            logger.debug("Error Response Headers: %s", e.response.headers)
+            logger.error("Error Response Body: %s", truncate_body(e.response.text))
+        retryable = is_retryable(e)
+        if retryable:
+            guard.breaker.record_failure()
+        else:
+            # The upstream answered, so it counts as healthy for the breaker
+            guard.breaker.record_success()
+        return None, retryable
+    finally:
+        inflight_upstream_requests -= 1
+
+@contextlib.asynccontextmanager
+async def upstream_slot(key: tuple | None):
+    """A scheduler slot for one upstream attempt.
+
+    A fetch for a cache key queues under every client currently waiting on
+    that key, and later arrivals join it (see fetch_findgems); a refresh that
+    nobody waits on queues as background work.
+    """
+    if key is None:
+        clients = [current_client.get()]
+    else:
+        clients = list(fetch_waiters.get(key, ())) or [BACKGROUND_CLIENT]
+    request = SlotRequest()
+    for client in clients[1:]:
+        upstream_scheduler.join(request, client, client_weight(client))
+    if key is not None:
+        queued_fetches[key] = request
+    try:
+        await upstream_scheduler.acquire(clients[0], client_weight(clients[0]), request)
+    finally:
+        if key is not None and queued_fetches.get(key) is request:
+            del queued_fetches[key]
+    try:
+        yield
+    finally:
+        upstream_scheduler.release()
+
+async def make_boltrade_request(url: str, key: tuple | None = None) -> dict[str, Any] | None:
+    """Make a request to the Boltrade API with proper error handling.
+
+    Retries transient failures with jittered backoff while the shared retry
+    budget allows, and fails fast while the endpoint's circuit is open (the
+    response cache then serves its last good snapshot, if any). key is the
+    cache key being fetched, whose waiting clients share the request's slot.
+    """
+    if upstream_pool is None:
+        logger.error("Upstream proxy pool is not initialized")
+        return None
+
+    logger.debug("BOLTRADE API REQUEST: %s headers=%s", url, UPSTREAM_HEADERS)
+
+    endpoint = urllib.parse.urlsplit(url).path.rsplit("/", 1)[-1]
+    guard = upstream_guard(endpoint)
+    retry_budget.deposit()
+    for attempt in range(1, UPSTREAM_MAX_ATTEMPTS + 1):
+        # Checked before queueing for a slot, so an open circuit fails fast
+        if not guard.breaker.allow_request():
+            UPSTREAM_ERRORS.inc(endpoint=endpoint, error="CircuitOpen")
+            logger.warning("BOLTRADE API CIRCUIT OPEN: %s, failing fast (retry in %.0fs)",
+                           endpoint, guard.breaker.retry_after())
+            return None
+        probing = guard.breaker.state == CircuitBreaker.HALF_OPEN
+        try:
+            # Raises Overloaded (shedding the request) if no slot frees up in time
+            async with upstream_slot(key):
+                response_data, retryable = await request_once(url, endpoint, guard)
+        except (asyncio.CancelledError, Overloaded):
+            if probing:
+                guard.breaker.release_probe()
+            raise
+        if response_data is not None or not retryable:
+            return response_data
+        if attempt == UPSTREAM_MAX_ATTEMPTS:
+            break
+        if not retry_budget.try_withdraw():
+            logger.warning("BOLTRADE API RETRY BUDGET EXHAUSTED: %s", endpoint)
+            break
+        UPSTREAM_RETRIES.inc(endpoint=endpoint)
+        await asyncio.sleep(backoff_delay(attempt))
+    return None
+
+def findgems_url(endpoint: str, request_data: dict[str, Any]) -> str:
+    return f"{UPSTREAM_BASE_URL}/onchain/v1/findgems/{endpoint}?{urllib.parse.urlencode(request_data)}"
+
+def index_page(endpoint: str, response_data: dict[str, Any]) -> None:
+    """Record every token of a fetched page in the address index."""
+    name = TOOLS_BY_ENDPOINT[endpoint]
+    tool = FINDGEMS_TOOLS[name]
+    token_index.add(name, response_data.get(tool.list_key, []), tool.address_key)
+
+def findgems_fetcher(endpoint: str, request_data: dict[str, Any]):
+    owner = topology.owner(ResponseCache.make_key(endpoint, request_data))
+    if owner != topology.index:
+        return peer_fetcher(owner, endpoint, request_data)
+    return upstream_fetcher(endpoint, request_data)
+
+def record_history(endpoint: str, request_data: dict[str, Any], response_data: dict[str, Any]) -> None:
+    """Buffer a fetched page's metrics in the history store, ranked by list position."""
+    name = TOOLS_BY_ENDPOINT[endpoint]
+    tool = FINDGEMS_TOOLS[name]
+    rows = [
+        {"address": token.get(tool.address_key),
+         **{metric: token.get(field) for metric, field in tool.history_fields.items()}}
+        for token in response_data.get(tool.list_key, [])
+    ]
+    first_rank = (int(request_data.get("start", 1)) - 1) * UPSTREAM_PAGE_SIZE + 1
+    history_store.record(name, rows, first_rank)
+
+def upstream_fetcher(endpoint: str, request_data: dict[str, Any]):
+    url = findgems_url(endpoint, request_data)
+
+    async def fetch() -> dict[str, Any] | None:
+        response_data = await make_boltrade_request(url, ResponseCache.make_key(endpoint, request_data))
+        if response_data is not None:
+            index_page(endpoint, response_data)
+            record_history(endpoint, request_data, response_data)
+        return response_data
+
+    return fetch
+
+def peer_fetcher(owner: int, endpoint: str, request_data: dict[str, Any]):
+    """Fetch a page through the worker that owns its cache key, so only it calls upstream."""
+    key = ResponseCache.make_key(endpoint, request_data)
+
+    async def fetch() -> Aged | None:
+        # The owner queues the fetch under every client waiting here (or as background work)
+        clients = peer_fetch_clients[key] = set(fetch_waiters.get(key, ())) or {BACKGROUND_CLIENT}
+        try:
+            response = await peers.post_json(
+                owner, f"/internal/pages/{endpoint}", request_data, client=",".join(sorted(clients)))
+            if response.status_code == 503:
+                # The owner shed the request; going upstream here would defeat its limit
+                busy = loads(response.content)
+                raise Overloaded(busy["error"], busy["retry_after"])
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.warning(f"Worker {owner} unreachable for {endpoint} ({type(e).__name__}); fetching upstream")
+            return await upstream_fetcher(endpoint, request_data)()
+        finally:
+            if peer_fetch_clients.get(key) is clients:
+                del peer_fetch_clients[key]
+        page = loads(response.content)
+        if page["value"] is None:
+            return None
+        index_page(endpoint, page["value"])
+        return Aged(page["value"], page["age"])
+
+    return fetch
+
+async def join_peer_fetch(endpoint: str, request_data: dict[str, Any], client: str) -> None:
+    """Ask the owner for a page again on behalf of client, so its pending fetch also queues under client."""
+    owner = topology.owner(ResponseCache.make_key(endpoint, request_data))
+    try:
+        await peers.post_json(owner, f"/internal/pages/{endpoint}", request_data, client=client)
+    except httpx.HTTPError:
+        # The original request reports the failure
+        pass
+
+async def fetch_findgems(endpoint: str, request_data: dict[str, Any],
+                         clients: list[str] | None = None) -> CacheEntry | None:
+    """Fetch a findgems page, served from the response cache when possible.
+
+    clients are who the page is for (default: the current client). They are
+    counted as waiting on the page's fetch until this returns, and join its
+    slot request if that fetch is already queued.
+    """
+    key = ResponseCache.make_key(endpoint, request_data)
+    clients = clients or [current_client.get()]
+    waiters = fetch_waiters.setdefault(key, {})
+    for client in clients:
+        waiters[client] = waiters.get(client, 0) + 1
+        queued = queued_fetches.get(key)
+        if queued is not None:
+            upstream_scheduler.join(queued, client, client_weight(client))
+        sent = peer_fetch_clients.get(key)
+        if sent is not None and client not in sent:
+            sent.add(client)
+            task = asyncio.create_task(join_peer_fetch(endpoint, request_data, client))
+            _peer_joins.add(task)
+            task.add_done_callback(_peer_joins.discard)
+    try:
+        return await response_cache.get_entry(
+            endpoint, request_data, findgems_fetcher(endpoint, request_data)
+        )
+    finally:
+        for client in clients:
+            waiters[client] -= 1
+            if not waiters[client]:
+                del waiters[client]
+        if not waiters and fetch_waiters.get(key) is waiters:
+            del fetch_waiters[key]
+
+def stale_notice(entries: list[CacheEntry | None]) -> list[types.TextContent]:
+    """Extra content telling the client the data includes an older snapshot."""
+    ages = [entry.age for entry in entries if entry is not None and entry.stale]
+    if not ages:
+        return []
+    return [types.TextContent(
+        type="text",
+        text=f"Note: upstream refresh pending or failed; data is a stale snapshot from {max(ages):.0f}s ago"
+    )]
+
+def result_budget(arguments: dict[str, Any], configured: int) -> int:
+    """The byte budget for one call: the configured one, lowered by a max_bytes argument."""
+    requested = arguments.get("max_bytes")
+    if requested is None:
+        return configured
+    requested = max(int(requested), 1)
+    return min(configured, requested) if configured else requested
+
+def result_precision(arguments: dict[str, Any]) -> int | None:
+    """Significant digits for one call: the precision argument, else OUTPUT_PRECISION."""
+    precision = arguments.get("precision", OUTPUT_PRECISION)
+    if precision is None:
         return None
+    try:
+        digits = int(precision)
+        integral = not isinstance(precision, bool) and digits == float(precision)
+    except (TypeError, ValueError):
+        integral = False
+    if not integral or not 1 <= digits <= 17:
+        raise ValueError(f"precision must be an integer from 1 to 17, got {precision!r}")
+    return digits
+
+def trimmed_note(max_bytes: int, dropped: list[str], kept: int, total: int) -> str | None:
+    """What fit_rows left out, if anything."""
+    trimmed = []
+    if dropped:
+        trimmed.append(f"dropped fields {', '.join(dropped)}")
+    if kept < total:
+        trimmed.append(f"returned {kept} of {total} rows")
+    if not trimmed:
+        return None
+    return (f"Note: result trimmed to fit {max_bytes} bytes: {'; '.join(trimmed)}. "
+            "Request fewer fields or rows to get the rest")
+
+def fit_result(
+    name: str, rows: list[dict[str, Any]], columns: list[str], output_format: str,
+    precision: int | None, max_bytes: int, drop_order: tuple[str, ...] = (),
+    render: Callable[[list[dict[str, Any]], list[str]], str] | None = None,
+) -> list[types.TextContent]:
+    """Format rows within max_bytes, noting any fields or rows left out to fit."""
+    text, dropped, kept = fit_rows(rows, columns, output_format, precision, max_bytes, drop_order, render)
+    contents = [types.TextContent(type="text", text=text)]
+    note = trimmed_note(max_bytes, dropped, kept, len(rows))
+    if note is not None:
+        TRIMMED_RESULTS.inc(tool=name)
+        contents.append(types.TextContent(type="text", text=note))
+    return contents
+
+async def fetch_pages(
+    tool: FindgemsTool,
+    page_requests: list[dict[str, Any]],
+    on_page: Callable[[int, CacheEntry | None], Awaitable[None]] | None = None,
+) -> list[CacheEntry | None]:
+    """Fetch several findgems pages concurrently, at most PAGE_FETCH_CONCURRENCY at a time."""
+    semaphore = asyncio.Semaphore(PAGE_FETCH_CONCURRENCY)
+    entries: list[CacheEntry | None] = [None] * len(page_requests)
+
+    async def fetch_page(index: int, request_data: dict[str, Any]) -> None:
+        async with semaphore:
+            entries[index] = await fetch_findgems(tool.endpoint, request_data)
+        if on_page is not None:
+            await on_page(index, entries[index])
+
+    await asyncio.gather(*(fetch_page(index, request_data)
+                           for index, request_data in enumerate(page_requests)))
+    return entries
+
+def page_tokens(tool: FindgemsTool, entry: CacheEntry, seen: set[str], room: int) -> list[dict[str, Any]]:
+    """The tokens of one page whose addresses are not in seen, at most room of them."""
+    tokens = []
+    for token in entry.value.get(tool.list_key, []):
+        if len(tokens) >= room:
+            break
+        address = token.get(tool.address_key)
+        if address is not None:
+            if address in seen:
+                continue
+            seen.add(address)
+        tokens.append(token)
+    return tokens
+
+def merge_pages(tool: FindgemsTool, entries: list[CacheEntry | None], limit: int) -> list[dict[str, Any]]:
+    """Concatenate page token lists in order, dropping repeated addresses."""
+    seen: set[str] = set()
+    tokens = []
+    for entry in entries:
+        if entry is not None:
+            tokens += page_tokens(tool, entry, seen, limit - len(tokens))
+    return tokens
+
+def progress_sender(total: int) -> Callable[[str], Awaitable[None]] | None:
+    """Return a callback that streams partial results as MCP progress notifications.
+
+    Returns None when the current request did not ask for progress. The
+    partial rows go in the notification's message field.
+    """
+    try:
+        ctx = server.request_context
+    except LookupError:
+        return None
+    progress_token = ctx.meta.progressToken if ctx.meta else None
+    if progress_token is None:
+        return None
+    completed = 0
+
+    async def send(message: str) -> None:
+        nonlocal completed
+        completed += 1
+        try:
+            await ctx.session.send_notification(
+                types.ServerNotification(
+                    types.ProgressNotification(
+                        method="notifications/progress",
+                        params=types.ProgressNotificationParams(
+                            progressToken=progress_token,
+                            progress=completed,
+                            total=total,
+                            message=message,
+                        ),
+                    )
+                )
+            )
+        except Exception as e:
+            logger.debug("Progress notification failed: %s", e)
+
+    return send
+
+# Hot pages kept warm in the background: the first PREFETCH_PAGES pages of each tool
+PREFETCH_PAGES = settings.prefetch_pages
+prefetcher = Prefetcher(
+    response_cache,
+    targets=[
+        (endpoint, {"limit": 10, "start": page, "chain": "solana", "frame": frame})
+        for endpoint, frame in ((TOP_SCORE_ENDPOINT, "30d"), (SMART_MONEY_ENDPOINT, "1d"))
+        for page in range(1, PREFETCH_PAGES + 1)
+        # Other workers pull their copies of these pages from the owner on demand
+        if topology.owns(ResponseCache.make_key(endpoint, {"limit": 10, "start": page, "chain": "solana", "frame": frame}))
+    ],
+    fetch_factory=findgems_fetcher,
+    interval=settings.prefetch_interval,
+)
+
+async def lookup_tokens(arguments: dict[str, Any]) -> list[types.TextContent]:
+    """Answer an address lookup from the token index, scanning list pages for misses."""
+    addresses = arguments.get("addresses")
+    if not addresses:
+        raise ValueError("addresses is required")
+    if not isinstance(addresses, list) or not all(isinstance(address, str) for address in addresses):
+        raise ValueError("addresses must be a list of address strings")
+    addresses = list(dict.fromkeys(addresses))
+    if len(addresses) > LOOKUP_MAX_ADDRESSES:
+        raise ValueError(f"At most {LOOKUP_MAX_ADDRESSES} addresses per call")
+    max_age = float(arguments.get("max_age", TOKEN_INDEX_MAX_AGE))
+
+    misses = [address for address in addresses if not token_index.get(address, max_age)]
+    # There is no per-address endpoint: page through both lists until every miss is found
+    page = 1
+    while misses and page <= LOOKUP_MAX_PAGES:
+        await asyncio.gather(*(
+            fetch_findgems(tool.endpoint, {
+                "limit": UPSTREAM_PAGE_SIZE, "start": page, "chain": "solana", "frame": tool.frame
+            })
+            for tool in FINDGEMS_TOOLS.values()
+        ))
+        misses = [address for address in misses if not token_index.get(address, max_age)]
+        page += 1
+    logger.debug("Token lookup: %s addresses, %s misses after %s pages", len(addresses), len(misses), page - 1)
+
+    tokens = []
+    not_found = []
+    for address in addresses:
+        # Fall back to an older record rather than reporting a known token as missing
+        records = token_index.get(address)
+        if not records:
+            not_found.append(address)
+            continue
+        for record in records:
+            row = FINDGEMS_TOOLS[record.source].projection.row(record.token)
+            row["source"] = record.source
+            row["age_seconds"] = round(record.age)
+            tokens.append(row)
+
+    # Rows come from both lists; give up the low-priority fields of either
+    columns = list(dict.fromkeys(key for row in tokens for key in row))
+    drop_order = tuple(dict.fromkeys(field for tool in FINDGEMS_TOOLS.values() for field in tool.drop_order))
+
+    def render(rows: list[dict[str, Any]], columns: list[str]) -> str:
+        return dumps({"tokens": rows, "not_found": not_found})
+
+    return fit_result(
+        TOKENS_BY_ADDRESS_TOOL, tokens, columns, "json", None,
+        result_budget(arguments, settings.result_max_bytes), drop_order, render,
+    )
+
+def query_snapshot(source: str) -> Snapshot:
+    """Columnar snapshot of the fresh index records for one list."""
+    cached = query_snapshots.get(source)
+    if cached is not None and cached[0] == token_index.version:
+        return cached[1]
+    projection = FINDGEMS_TOOLS[source].projection
+    rows = [projection.row(record.token) for record in token_index.records(source, TOKEN_INDEX_MAX_AGE)]
+    snapshot = Snapshot(rows, projection.output_keys)
+    query_snapshots[source] = (token_index.version, snapshot)
+    return snapshot
+
+async def query_tokens(arguments: dict[str, Any]) -> list[types.TextContent]:
+    """Filter and sort the locally held snapshot of a list in one call."""
+    source = arguments.get("source") or "get-sol-top-score-list"
+    tool = FINDGEMS_TOOLS.get(source)
+    if tool is None:
+        raise ValueError(f"Unknown source: {source}")
+    limit = min(max(int(arguments.get("limit", 20)), 1), MAX_RESULT_LIMIT)
+    projection = tool.projection.select(arguments.get("fields"))
+    output_format = arguments.get("format") or "json"
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown format: {output_format} (expected one of {', '.join(FORMATS)})")
+    precision = result_precision(arguments)
+
+    # Cheap when the prefetcher keeps these pages warm; refills the index otherwise
+    await fetch_pages(tool, [
+        {"limit": UPSTREAM_PAGE_SIZE, "start": page, "chain": "solana", "frame": tool.frame}
+        for page in range(1, QUERY_SNAPSHOT_PAGES + 1)
+    ])
+
+    snapshot = query_snapshot(source)
+    try:
+        rows, matched = snapshot.query(arguments.get("filter"), arguments.get("sort"), limit)
+    except QueryError as e:
+        raise ValueError(f"Invalid query: {e}") from e
+    rows = [{key: row[key] for key in projection.output_keys} for row in rows]
+
+    return fit_result(
+        QUERY_TOKENS_TOOL, rows, projection.output_keys, output_format, precision,
+        result_budget(arguments, tool.max_bytes), tool.drop_order,
+    ) + [
+        types.TextContent(
+            type="text",
+            text=f"Returned {len(rows)} of {matched} matches among {len(snapshot)} tokens in the {source} snapshot"
+        )
+    ]
+
+def history_since(arguments: dict[str, Any]) -> float:
+    window = to_seconds(arguments.get("window") or "6h")
+    if math.isnan(window):
+        raise ValueError(f"Cannot parse window: {arguments.get('window')!r} (e.g. 30min, 6h, 2d)")
+    return time.time() - window
+
+def utc_time(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec="seconds")
+
+async def token_history(arguments: dict[str, Any]) -> list[types.TextContent]:
+    """Answer a per-address history query from the local snapshot store."""
+    address = arguments.get("address")
+    if not address:
+        raise ValueError("address is required")
+    source = arguments.get("source")
+    if source is not None and source not in FINDGEMS_TOOLS:
+        raise ValueError(f"Unknown source: {source} (expected one of {', '.join(FINDGEMS_TOOLS)})")
+    output_format = arguments.get("format") or "json"
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown format: {output_format} (expected one of {', '.join(FORMATS)})")
+    precision = result_precision(arguments)
+    limit = min(max(int(arguments.get("limit", 100)), 1), HISTORY_MAX_POINTS)
+
+    points = await history_store.history(address, history_since(arguments), source, limit)
+    if not points:
+        return [types.TextContent(type="text", text=f"No recorded snapshots of {address} in that window")]
+    columns = ["time", "source", "rank", *METRICS]
+    rows = [dict(time=utc_time(point["ts"]), **{column: point[column] for column in columns[1:]})
+            for point in points]
+    return fit_result(
+        TOKEN_HISTORY_TOOL, rows, columns, output_format, precision,
+        result_budget(arguments, settings.result_max_bytes),
+    )
+
+async def top_movers(arguments: dict[str, Any]) -> list[types.TextContent]:
+    """Rank addresses by how much a metric changed within the window, from the snapshot store."""
+    source = arguments.get("source") or "get-sol-top-score-list"
+    if source not in FINDGEMS_TOOLS:
+        raise ValueError(f"Unknown source: {source} (expected one of {', '.join(FINDGEMS_TOOLS)})")
+    metric = arguments.get("metric") or "score"
+    direction = arguments.get("direction") or "both"
+    if direction not in ("up", "down", "both"):
+        raise ValueError(f"Unknown direction: {direction} (expected up, down or both)")
+    output_format = arguments.get("format") or "json"
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown format: {output_format} (expected one of {', '.join(FORMATS)})")
+    precision = result_precision(arguments)
+    limit = min(max(int(arguments.get("limit", 10)), 1), MAX_RESULT_LIMIT)
+
+    movers = await history_store.movers(
+        source, metric, history_since(arguments), limit,
+        relative=arguments.get("change", "relative") != "absolute", direction=direction,
+    )
+    if not movers:
+        return [types.TextContent(type="text", text=f"No {metric} changes recorded for {source} in that window")]
+    columns = ["CA address", "symbol", "from", "to", "change", "pct_change", "since", "until", "samples"]
+    rows = []
+    for mover in movers:
+        records = token_index.get(mover["address"])
+        rows.append({
+            "CA address": mover["address"],
+            "symbol": records[0].token.get("symbol") if records else None,
+            "from": mover["from"],
+            "to": mover["to"],
+            "change": mover["change"],
+            "pct_change": mover["pct_change"],
+            "since": utc_time(mover["first_ts"]),
+            "until": utc_time(mover["last_ts"]),
+            "samples": mover["samples"],
+        })
+    return fit_result(
+        TOP_MOVERS_TOOL, rows, columns, output_format, precision,
+        result_budget(arguments, settings.result_max_bytes),
+    )
+
+def watch_uri(name: str) -> str:
+    return f"{WATCH_URI_PREFIX}{name}"
+
+def watched_tool(uri: str) -> FindgemsTool:
+    name = uri[len(WATCH_URI_PREFIX):] if uri.startswith(WATCH_URI_PREFIX) else None
+    if name not in FINDGEMS_TOOLS:
+        raise ValueError(f"Unknown resource: {uri}")
+    return FINDGEMS_TOOLS[name]
+
+async def watch_rows(uri: str) -> list[dict[str, Any]] | None:
+    """Current projected rows of the first WATCH_PAGES pages of a watched list."""
+    tool = watched_tool(uri)
+    page_requests = [
+        {"limit": UPSTREAM_PAGE_SIZE, "start": page, "chain": "solana", "frame": tool.frame}
+        for page in range(1, WATCH_PAGES + 1)
+    ]
+    entries = await fetch_pages(tool, page_requests)
+    if not any(entries):
+        return None
+    return tool.projection(merge_pages(tool, entries, WATCH_PAGES * UPSTREAM_PAGE_SIZE))
+
+def watch_diff(uri: str, previous: list[dict[str, Any]], current: list[dict[str, Any]]) -> dict[str, list]:
+    tool = watched_tool(uri)
+    thresholds = [
+        Threshold(tool.price_field, WATCH_PRICE_CHANGE, relative=True),
+        Threshold("score", WATCH_SCORE_CHANGE),
+    ]
+    return diff_rows(previous, current, "CA address", thresholds, WATCH_MIN_RANK_MOVE)
+
+async def send_watch_update(session, uri: str, changes: dict[str, list]) -> None:
+    """Push a resources/updated notification carrying only the changes."""
+    # A client that cannot take the update in time is dropped rather than holding up the others
+    await asyncio.wait_for(session.send_notification(
+        types.ServerNotification(
+            types.ResourceUpdatedNotification(
+                method="notifications/resources/updated",
+                params=types.ResourceUpdatedNotificationParams(uri=uri, changes=changes),
+            )
+        )
+    ), settings.sse_send_timeout or None)
+
+async def poll_watched(uri: str) -> list[dict[str, Any]] | None:
+    # Polling serves every subscriber, so it is scheduled as background work
+    current_client.set(BACKGROUND_CLIENT)
+    return await watch_rows(uri)
+
+# Each watched list is polled once (through the cache) however many sessions subscribe
+watch_hub = WatchHub(
+    load=poll_watched,
+    diff=watch_diff,
+    send=send_watch_update,
+    interval=lambda uri: WATCH_INTERVAL if WATCH_INTERVAL else max(
+        response_cache.ttl_for(watched_tool(uri).endpoint), 1.0),
+)
+sse_sessions = SessionRegistry(
+    max_sessions=settings.sse_max_sessions,
+    max_queued=settings.sse_max_queued_messages,
+    max_inflight=settings.sse_max_inflight,
+    idle_timeout=settings.sse_idle_timeout,
+    heartbeat_timeout=settings.sse_heartbeat_timeout,
+    send_timeout=settings.sse_send_timeout,
+    # The hub drops subscribers whose pushes fail, so ask it rather than the session's own record
+    watching=lambda session: any(
+        watch_hub.is_subscribed(uri, subscriber) for uri, subscriber in session.watches.items()),
+)
+# Subscriptions made over the current SSE connection (uri -> server session), dropped when it closes
+connection_watches: contextvars.ContextVar[dict[str, Any] | None] = contextvars.ContextVar(
+    "connection_watches", default=None)
+
+def subscribe_session(uri: str) -> None:
+    session = server.request_context.session
+    watch_hub.subscribe(uri, session)
+    watches = connection_watches.get()
+    if watches is not None:
+        watches[uri] = session
+
+def unsubscribe_session(uri: str) -> None:
+    watch_hub.unsubscribe(uri, server.request_context.session)
+    watches = connection_watches.get()
+    if watches is not None:
+        watches.pop(uri, None)
+
+@server.list_resources()
+async def handle_list_resources() -> list[types.Resource]:
+    return [
+        types.Resource(
+            uri=watch_uri(name),
+            name=name,
+            description=f"First {WATCH_PAGES * UPSTREAM_PAGE_SIZE} tokens of {name}; subscribe for pushed changes",
+            mimeType="application/json",
+        )
+        for name in FINDGEMS_TOOLS
+    ]
+
+@server.read_resource()
+async def handle_read_resource(uri) -> list[ReadResourceContents]:
+    tool = watched_tool(str(uri))
+    rows = await watch_rows(str(uri))
+    if rows is None:
+        raise ValueError(tool.error_text)
+    text, dropped, kept = fit_rows(rows, tool.projection.output_keys, "json", None, tool.max_bytes, tool.drop_order)
+    contents = [ReadResourceContents(content=text, mime_type="application/json")]
+    note = trimmed_note(tool.max_bytes, dropped, kept, len(rows))
+    if note is not None:
+        contents.append(ReadResourceContents(content=note, mime_type="text/plain"))
+    return contents
+
+@server.subscribe_resource()
+async def handle_subscribe_resource(uri) -> None:
+    watched_tool(str(uri))
+    subscribe_session(str(uri))
+
+@server.unsubscribe_resource()
+async def handle_unsubscribe_resource(uri) -> None:
+    unsubscribe_session(str(uri))
+
+async def watch_tokens(arguments: dict[str, Any]) -> list[types.TextContent]:
+    """Subscribe the calling session to a list, returning its current rows."""
+    source = arguments.get("source") or "get-sol-smart-money-listing"
+    if source not in FINDGEMS_TOOLS:
+        raise ValueError(f"Unknown source: {source} (expected one of {', '.join(FINDGEMS_TOOLS)})")
+    uri = watch_uri(source)
+    if arguments.get("action") == "unsubscribe":
+        unsubscribe_session(uri)
+        return [types.TextContent(type="text", text=f"Unsubscribed from {uri}")]
+
+    rows = await watch_rows(uri)
+    if rows is None:
+        return [types.TextContent(type="text", text=FINDGEMS_TOOLS[source].error_text)]
+    subscribe_session(uri)
+    tool = FINDGEMS_TOOLS[source]
+    return fit_result(
+        WATCH_TOOL, rows, tool.projection.output_keys, "json", None,
+        result_budget(arguments, tool.max_bytes), tool.drop_order,
+    ) + [
+        types.TextContent(
+            type="text",
+            text=f"Subscribed to {uri}; changes arrive as notifications/resources/updated"
+        )
+    ]
 
 @server.call_tool()
 async def handle_call_tool(
     name: str, arguments: dict | None
 ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
     """Handle tool execution requests."""
-    print("\n" + "*"*100)
-    print(f"TOOL CALL: {name}")
-    print("*"*100)
-    print("Arguments:")
-    print(json.dumps(arguments, indent=2, ensure_ascii=False) if arguments else "None")
-
-    if name == "get-sol-top-score-list":
-        request_data = {
-            "limit": 10,
-            "start": 1,
-            "chain": "solana",
-            "frame": "30d"
-        }
-        
-        if arguments is not None:
-            for key in request_data.keys():
-                if key in arguments:
-                    request_data[key] = arguments[key]
-        if request_data["start"] < 1:
-            request_data["start"] = 1
-        request_data["limit"] = 10
-        print("\nProcessed Request Data:")
-        print(json.dumps(request_data, indent=2, ensure_ascii=False))
-        
-        gems_url = f"https://{API_BASE}/onchain/v1/findgems/top_score?{urllib.parse.urlencode(request_data)}"
-     
-        gems_data = await asyncio.to_thread(make_boltrade_request, gems_url)
-
-        if not gems_data:
-            return [types.TextContent(type="text", text="Failed to retrieve gems data")]
-
-        # Extract and format core token metrics
-        formatted_tokens = []
-        for token in gems_data.get("users", []):
-            core_metrics = {
-                "usd_price": token.get("usd_price"),
-                "CA address": token.get("token_address"),
-                "symbol": token.get("symbol"),
-              #      "name": token.get("name"), 说明 不用了
-              #      "image_url": token.get("image_url"),
-              #  "url": token.get("url", ""),
-                "volume_h24": token.get("volume_h24"),
-                "fdv": token.get("fdv"),
-                "market_cap": token.get("market_cap"),
-                "price_change_h24": token.get("price_change_h24"),
-                "liquidity_usd": token.get("liquidity_usd"),
-                "score": token.get("score"),
-                "token_age": token.get("token_age")
-             #   "TokenAgeDuration": token.get("TokenAgeDuration"),
-             #   "avg_price": token.get("avg_price"),
-           #     "roi": token.get("roi"),
-            #    "NumberOfUsers": token.get("NumberOfUsers")
-            }
-            formatted_tokens.append(core_metrics)
-
-        logger.info("="*100)
-        logger.info("TOP SCORE LIST - FORMATTED DATA:")
-        logger.info("="*100)
-        logger.info(json.dumps(formatted_tokens))
-        logger.info("="*100)
-
-        return [
-            types.TextContent(
-                type="text",
-                text=json.dumps(formatted_tokens)
-            )
-        ]
-
-    elif name == "get-sol-smart-money-listing":
-        logger.info("="*100)
-        logger.info("TOOL CALL: sol-smart-money-new-listing")
-        logger.info("="*100)
-        logger.info("Arguments:")
-        logger.info(json.dumps(arguments, indent=2, ensure_ascii=False) if arguments else "None")
-
-        request_data = {
-            "limit": 10,
-            "start": 1,
-            "chain": "solana",
-            "frame": "1d"
-        }
-        
-        if arguments is not None:
-            for key in request_data.keys():
-                if key in arguments:
-                    request_data[key] = arguments[key]
-        if request_data["start"] < 1:  #librechat 填入0 ？？？
-            request_data["start"] = 1
-        request_data["limit"] = 10
-        logger.info("Processed Request Data:")
-        logger.info(json.dumps(request_data, indent=2, ensure_ascii=False))
-        
-        url = f"https://{API_BASE}/onchain/v1/findgems/smart_money_new_listing_buy?{urllib.parse.urlencode(request_data)}"
-
-        response_data = await asyncio.to_thread(make_boltrade_request, url)
-
-        if not response_data:
-            return  [types.TextContent(type="text", text="Failed to retrieve smart money data")]
-
-        # Extract and format core metrics
-        formatted_tokens =''
-        formattedjson = []
-        for token in response_data.get("smart_money_new_listing_buy", []):
-            core_metrics = {
-                #   "name": token.get("name"),
-                "CA address": token.get("address"),
-                "symbol": token.get("symbol"),
-                "current_price": token.get("current_price"),
-                #"image_url": token.get("image_url"),
-                "pnl": token.get("pnl"),
-                "token_age": token.get("token_age"),
-                #    "TokenAgeDuration": token.get("TokenAgeDuration"),
-                "avg_price": token.get("avg_price"),
-                "price_change_24h": token.get("price_change_24h"),
-                "NumberOfSmartMoney": token.get("NumberOfSmartMoney"),
-                "usdt_value": token.get("usdt_value"),
-                "total_spent": token.get("total_spent"),
-                "liquidity": token.get("liquidity"),
-                "market_cap": token.get("market_cap"),
-                "fdv": token.get("fdv"),
-                #     "roi": token.get("roi"),
-                "score": token.get("score"),
-                # "realized_percent": token.get("realized_percent"),
-                # "hold_in_token": token.get("hold_in_token"),
-                # "hold_in_usdt": token.get("hold_in_usdt"),
-                # "tx_buy": token.get("tx_buy"),
-                # "tx_sell": token.get("tx_sell"),
-                # "buy_volume_in_usdt": token.get("buy_volume_in_usdt"),
-                # "sell_volume_in_usdt": token.get("sell_volume_in_usdt"),
-            
-                "risk": token.get("risk"),
-                "websites": token.get("websites"),
-                "telegram_handle": token.get("telegram_handle"),
-                "twitter_handle": token.get("twitter_handle"),
-                "discord_url": token.get("discord_url")
-                #   "pumpfun_link": token.get("pumpfun_link") 
-            }
-            # Convert numeric values to formatted strings with appropriate labels
-        #     formatted_text = (
-        #         f"Contract Address: {core_metrics['address']}\n"
-        #         f"Token Symbol: {core_metrics['symbol']}\n"
-        #         f"Current Price: ${core_metrics['current_price']:.8f}\n"
-        #         f"PnL: {core_metrics['pnl']:.2f}%\n"
-        #         f"Token Age: {core_metrics['token_age']}\n"
-        #         f"Token Duration: {core_metrics['TokenAgeDuration']} hours\n"
-        #    #     f"Average Price: ${core_metrics['avg_price']:.8f}\n"
-        #         f"24h Price Change: {core_metrics['price_change_24h']:.2f}%\n"
-        #         f"Smart Money Count: {core_metrics['NumberOfSmartMoney']}\n"
-        #         f"USDT Value: ${core_metrics['usdt_value']:,.2f}\n"
-        #     #    f"Total Spent: ${core_metrics['total_spent']:,.2f}\n"
-        #         f"Liquidity: ${core_metrics['liquidity']:,.2f}\n"
-        #         f"Market Cap: ${core_metrics['market_cap']:,.2f}\n"
-        #         f"Fully Diluted Value: ${core_metrics['fdv']:,.2f}\n"
-        #      #   f"ROI: {core_metrics['roi']:.2f}%\n"
-        #         f"Score: {core_metrics['score']:.2f}\n"
-        #         f"Risk Level: {core_metrics['risk']}\n"
-        #         f"Websites: {core_metrics['websites']}\n"
-        #         f"Telegram: {core_metrics['telegram_handle']}\n"
-        #         f"Twitter: {core_metrics['twitter_handle']}\n"
-        #         f"Discord: {core_metrics['discord_url']}\n"
-        #        # f"pumpfun_link: {core_metrics['pumpfun_link']}\n"
-                
-        #     )
-            formattedjson.append(core_metrics)
-        #    core_metrics = formatted_text
-         #   formatted_tokens = formatted_tokens + core_metrics
-
-        logger.info("="*100)
-        logger.info("FORMATTED TOKENS:")
-        logger.info("="*100)
-        logger.info(formatted_tokens)
-        logger.info("="*100)
-        logger.info("FORMATTED JSON:")
-        logger.info("="*100)
-        logger.info(json.dumps(formattedjson))
-        
-        return [
-            types.TextContent(
-                type="text",
-              #  text=formatted_tokens
-                text=json.dumps(formattedjson)
-            )
-        ]
+    logger.info("TOOL CALL: %s arguments=%s", name, arguments)
 
-    else:
+    if name not in FINDGEMS_TOOLS and name not in (
+            TOKENS_BY_ADDRESS_TOOL, QUERY_TOKENS_TOOL, TOKEN_HISTORY_TOOL, TOP_MOVERS_TOOL, WATCH_TOOL):
         raise ValueError(f"Unknown tool: {name}")
 
+    try:
+        rate_limiter.check(current_client.get())
+        return await dispatch_tool(name, arguments or {})
+    except Overloaded as e:
+        SHED_REQUESTS.inc(tool=name)
+        logger.warning("TOOL CALL SHED: %s client=%s: %s", name, current_client.get(), e)
+        raise busy_error(e) from e
+
+async def dispatch_tool(name: str, arguments: dict[str, Any]) -> list[types.TextContent]:
+    with TOOL_CALL_SECONDS.time(tool=name):
+        if name == TOKENS_BY_ADDRESS_TOOL:
+            return await lookup_tokens(arguments)
+        if name == QUERY_TOKENS_TOOL:
+            return await query_tokens(arguments)
+        if name == TOKEN_HISTORY_TOOL:
+            return await token_history(arguments)
+        if name == TOP_MOVERS_TOOL:
+            return await top_movers(arguments)
+        if name == WATCH_TOOL:
+            return await watch_tokens(arguments)
+        return await call_findgems_tool(name, FINDGEMS_TOOLS[name], arguments)
+
+async def call_findgems_tool(
+    name: str, tool: FindgemsTool, arguments: dict[str, Any]
+) -> list[types.TextContent]:
+    """Fetch, project and format one of the findgems list tools."""
+    request_data = {
+        "limit": 10,
+        "start": 1,
+        "chain": "solana",
+        "frame": tool.frame
+    }
+
+    for key in request_data.keys():
+        if key in arguments:
+            request_data[key] = arguments[key]
+    # Some clients (e.g. librechat) send 0 or a numeric string for start
+    request_data["start"] = max(int(request_data["start"]), 1)
+    limit = min(max(int(request_data["limit"]), 1), MAX_RESULT_LIMIT)
+    request_data["limit"] = UPSTREAM_PAGE_SIZE
+    logger.debug("Processed Request Data: %s limit=%s", request_data, limit)
+
+    projection = tool.projection.select(arguments.get("fields"))
+    output_format = arguments.get("format") or "json"
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown format: {output_format} (expected one of {', '.join(FORMATS)})")
+    precision = result_precision(arguments)
+
+    page_requests = [
+        dict(request_data, start=request_data["start"] + offset)
+        for offset in range(math.ceil(limit / UPSTREAM_PAGE_SIZE))
+    ]
+    max_bytes = result_budget(arguments, tool.max_bytes)
+    send_progress = progress_sender(len(page_requests))
+    # Pages are streamed in page order, as merge_pages will see them, so each
+    # notification holds only the rows of that page the final result keeps
+    arrived: dict[int, CacheEntry | None] = {}
+    streamed = kept = 0
+    seen: set[str] = set()
+
+    async def on_page(index: int, entry: CacheEntry | None) -> None:
+        nonlocal streamed, kept
+        arrived[index] = entry
+        while streamed in arrived:
+            page, entry = page_requests[streamed], arrived.pop(streamed)
+            streamed += 1
+            if entry is None:
+                await send_progress(f"Page {page['start']} failed to load")
+                continue
+            tokens = page_tokens(tool, entry, seen, limit - kept)
+            kept += len(tokens)
+            text, _, _ = fit_rows(projection(tokens), projection.output_keys, output_format, precision,
+                                  max_bytes, tool.drop_order)
+            await send_progress(text)
+
+    with TOOL_STAGE_SECONDS.time(tool=name, stage="fetch"):
+        entries = await fetch_pages(tool, page_requests, on_page if send_progress else None)
+
+    if not any(entries):
+        return [types.TextContent(type="text", text=tool.error_text)]
+
+    # Extract and format core token metrics
+    with TOOL_STAGE_SECONDS.time(tool=name, stage="projection"):
+        formatted_tokens = projection(merge_pages(tool, entries, limit))
+
+    with TOOL_STAGE_SECONDS.time(tool=name, stage="serialization"):
+        contents = fit_result(
+            name, formatted_tokens, projection.output_keys, output_format, precision,
+            max_bytes, tool.drop_order,
+        )
+    # Log the encoded response rather than encoding the rows a second time
+    logger.debug("%s - FORMATTED DATA: %s", name, contents[0].text)
+    failed_pages = [page["start"] for page, entry in zip(page_requests, entries) if entry is None]
+    if failed_pages:
+        contents.append(types.TextContent(
+            type="text",
+            text=f"Note: page(s) {', '.join(map(str, failed_pages))} failed to load; results are partial"
+        ))
+    return contents + stale_notice(entries)
+
  
+def server_capabilities() -> types.ServerCapabilities:
+    capabilities = server.get_capabilities(
+        notification_options=NotificationOptions(tools_changed=True),
+        experimental_capabilities={},
+    )
+    # The SDK always reports subscribe=False; watched lists support subscriptions
+    capabilities.resources.subscribe = True
+    return capabilities
+
 async def handle_sse(request):
-    async with sse.connect_sse(
-        request.scope, request.receive, request._send
-    ) as streams:
-        await server.run(
-            streams[0], streams[1], #server.create_initialization_options()
-            InitializationOptions(
-                    server_name="boltrader",
-                    server_version="0.1.1",
-                    capabilities=server.get_capabilities(
-                        notification_options=NotificationOptions(tools_changed=True),
-                        experimental_capabilities={},
-                    ),
-                ),
-        )
+    session = sse_sessions.open(client_key(request))
+    if session is None:
+        logger.warning("SSE session refused: %d sessions already open", sse_sessions.max_sessions)
+        return JSONResponse({"error": "Too many open sessions"}, status_code=503, headers={"Retry-After": "5"})
+    connection_watches.set(session.watches)
+    current_client.set(session.client)
+    try:
+        # Cancelled by the session registry when the client disconnects, stalls or idles out
+        with session.cancel_scope:
+            async with sse.connect_sse(
+                request.scope, session.wrap_receive(request.receive), session.wrap_send(request._send)
+            ) as (read_stream, write_stream):
+                inbound_writer, inbound_reader = anyio.create_memory_object_stream(0)
+                async with anyio.create_task_group() as tg:
+                    tg.start_soon(session.pump_in, read_stream, inbound_writer)
+                    tg.start_soon(session.pump_out, write_stream)
+                    await server.run(
+                        inbound_reader, session.outbound, #server.create_initialization_options()
+                        InitializationOptions(
+                                server_name="boltrader",
+                                server_version="0.1.1",
+                                capabilities=server_capabilities(),
+                            ),
+                    )
+                    session.close("ended")
+    finally:
+        sse_sessions.remove(session)
+        for uri, subscriber in session.watches.items():
+            watch_hub.unsubscribe(uri, subscriber)
+        if session.mcp_session_id is not None:
+            # mcp 1.3.0 never forgets a session's message writer; late POSTs now get 404
+            writer = sse._read_stream_writers.pop(uuid.UUID(hex=session.mcp_session_id), None)
+            if writer is not None:
+                writer.close()
+    return StreamEnd(session)
+
+async def route_post_message(scope, receive, send):
+    """Deliver a client message to the worker that owns its SSE session."""
+    owner = topology.message_owner(scope["path"])
+    if peers is None or owner is None or owner == topology.index:
+        await sse.handle_post_message(scope, receive, send)
+        return
+    response = await peers.forward(owner, Request(scope, receive))
+    await response(scope, receive, send)
+
+async def handle_peer_page(request: Request):
+    """Serve a findgems page from this worker's cache to another worker."""
+    if peers is None or not peers.is_peer_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    endpoint = request.path_params["endpoint"]
+    if endpoint not in TOOLS_BY_ENDPOINT:
+        return JSONResponse({"error": f"Unknown endpoint: {endpoint}"}, status_code=404)
+    # Queue the upstream fetch under the asking worker's clients, not as background work
+    clients = request.headers.get(PEER_CLIENT_HEADER, BACKGROUND_CLIENT).split(",")
+    current_client.set(clients[0])
+    try:
+        entry = await fetch_findgems(endpoint, loads(await request.body()), clients)
+    except Overloaded as e:
+        return JSONResponse({"error": str(e), "retry_after": e.retry_after}, status_code=503)
+    page = {"value": None} if entry is None else {"value": entry.value, "age": entry.age}
+    return Response(dumps(page), media_type="application/json")
+
+async def handle_ready(request: Request):
+    """Readiness probe: 503 until the upstream pool has been warmed."""
+    body = dict(readiness.stats(), worker=topology.index, startup=profile.stages)
+    return JSONResponse(body, status_code=200 if readiness.ready else 503)
+
+async def handle_cache_stats(request: Request):
+    return JSONResponse(dict(
+        response_cache.stats(),
+        worker={"index": topology.index, "count": topology.count},
+        token_index=token_index.stats(),
+        watches=watch_hub.stats(),
+        history=history_store.stats(),
+        sessions=sse_sessions.stats(),
+        upstream_scheduler=dict(upstream_scheduler.stats(), rate_limited=rate_limiter.limited),
+        proxies=upstream_pool.stats() if upstream_pool else [],
+    ))
+
+def executor_queue_depth() -> int:
+    """Work items waiting in the event loop's default thread pool, if it exists."""
+    try:
+        executor = getattr(asyncio.get_running_loop(), "_default_executor", None)
+    except RuntimeError:
+        return 0
+    work_queue = getattr(executor, "_work_queue", None)
+    return work_queue.qsize() if work_queue is not None else 0
+
+metrics.callback("boltrade_cache_lookups_total", "Response cache lookups by result", "counter", lambda: [
+    ({"result": result}, response_cache.stats()[key])
+    for result, key in (("hit", "hits"), ("stale", "stale_hits"), ("miss", "misses"), ("coalesced", "coalesced"))
+])
+metrics.callback("boltrade_cache_hit_ratio", "Share of cache lookups served without a new upstream fetch", "gauge",
+                 lambda: [({}, response_cache.stats()["hit_ratio"])])
+metrics.callback("boltrade_cache_entries", "Entries in the response cache", "gauge",
+                 lambda: [({}, response_cache.stats()["entries"])])
+metrics.callback("boltrade_active_sse_sessions", "Open SSE sessions", "gauge",
+                 lambda: [({}, len(sse_sessions.sessions))])
+metrics.callback("boltrade_sse_buffered_bytes", "Estimated bytes queued for SSE clients", "gauge",
+                 lambda: [({}, sum(session.buffered_bytes for session in sse_sessions.sessions.values()))])
+metrics.callback("boltrade_sse_sessions_closed_total", "Closed SSE sessions by reason", "counter",
+                 lambda: [({"reason": reason}, count) for reason, count in sse_sessions.closed.items()])
+metrics.callback("boltrade_upstream_inflight_requests", "Upstream requests in flight", "gauge",
+                 lambda: [({}, inflight_upstream_requests)])
+metrics.callback("boltrade_circuit_open", "1 while an endpoint's circuit breaker is not closed", "gauge", lambda: [
+    ({"endpoint": endpoint}, int(guard.breaker.state != CircuitBreaker.CLOSED))
+    for endpoint, guard in upstream_guards.items()
+])
+metrics.callback("boltrade_upstream_timeout_seconds", "Current adaptive upstream timeout", "gauge", lambda: [
+    ({"endpoint": endpoint}, guard.latency.timeout()) for endpoint, guard in upstream_guards.items()
+])
+metrics.callback("boltrade_proxy_outstanding_requests", "In-flight requests per proxy", "gauge", lambda: [
+    ({"proxy": proxy["proxy"]}, proxy["outstanding"]) for proxy in (upstream_pool.stats() if upstream_pool else [])
+])
+metrics.callback("boltrade_proxy_ewma_latency_seconds", "Smoothed latency per proxy", "gauge", lambda: [
+    ({"proxy": proxy["proxy"]}, proxy["ewma_latency"] or 0.0) for proxy in (upstream_pool.stats() if upstream_pool else [])
+])
+metrics.callback("boltrade_proxy_ejected", "1 while a proxy is ejected from the pool", "gauge", lambda: [
+    ({"proxy": proxy["proxy"]}, int(proxy["ejected"])) for proxy in (upstream_pool.stats() if upstream_pool else [])
+])
+metrics.callback("boltrade_upstream_queue_depth", "Upstream requests waiting for a slot", "gauge",
+                 lambda: [({}, upstream_scheduler.queued)])
+metrics.callback("boltrade_upstream_active_slots", "Upstream request slots in use", "gauge",
+                 lambda: [({}, upstream_scheduler.active)])
+metrics.callback("boltrade_threadpool_queue_depth", "Work items queued in the default thread pool", "gauge",
+                 lambda: [({}, executor_queue_depth())])
+
+async def handle_metrics(request: Request):
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 routes = [
     Route("/sse", endpoint=handle_sse),
-    Mount("/messages/", app=sse.handle_post_message),
+    Route("/cache/stats", endpoint=handle_cache_stats),
+    Route("/ready", endpoint=handle_ready),
+    Mount("/messages/", app=route_post_message),
 ]
+if topology.enabled:
+    routes.append(Route("/internal/pages/{endpoint}", endpoint=handle_peer_page, methods=["POST"]))
+if METRICS_ENABLED:
+    routes.append(Route("/metrics", endpoint=handle_metrics))
+
+readiness = Readiness()
 
-app = Starlette(routes=routes, debug=True)
+async def warm_up(pool: ProxyPool) -> None:
+    """Open a connection through every proxy, then report ready.
+
+    Retries until a proxy answers; after READY_TIMEOUT seconds the process
+    reports ready anyway, serving cached and stale data while upstream is down.
+    """
+    deadline = time.monotonic() + settings.ready_timeout
+    while True:
+        healthy = await pool.warm()
+        if healthy:
+            readiness.set(True, f"{healthy}/{len(pool.proxies)} proxies warm")
+            break
+        if time.monotonic() >= deadline:
+            logger.warning(f"Upstream unreachable after {settings.ready_timeout:g}s; reporting ready anyway")
+            readiness.set(True, "upstream unreachable")
+            break
+        readiness.set(False, "waiting for upstream")
+        await asyncio.sleep(1)
+    profile.mark("ready")
+    logger.info(f"Startup: {profile.summary()}")
 
-def start_server(host: str = "0.0.0.0", port: int = 3002):
-    logger.info(f"Starting server on {host}:{port}")
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    """Open the shared upstream proxy pool for the lifetime of the app."""
+    global upstream_pool
+    # No-op when started through main.py, which sets logging up before importing this module
+    setup_logging(settings.log_level, settings.log_dir)
+    profile.mark("lifespan")
+    upstream_pool = create_proxy_pool()
+    sse_sessions.start()
+    warming = None
+    if HISTORY_ENABLED:
+        await history_store.start()
+    if upstream_pool is not None:
+        upstream_pool.start()
+        warming = asyncio.create_task(warm_up(upstream_pool))
+        if settings.prefetch_enabled:
+            prefetcher.start()
+    else:
+        readiness.set(False, "no upstream proxy configured")
     try:
-        uvicorn.run(app, host=host, port=port)
-    except Exception as e:
-        logger.error(f"Server startup error: {str(e)}")
-        raise
+        yield
+    finally:
+        if warming is not None:
+            warming.cancel()
+        await sse_sessions.stop()
+        await prefetcher.stop()
+        await watch_hub.stop()
+        await history_store.stop()
+        if upstream_pool is not None:
+            await upstream_pool.aclose()
+            upstream_pool = None
+        if peers is not None:
+            await peers.aclose()
+
+middleware = []
+if settings.compression_enabled:
+    # Peer page responses are already-encoded JSON exchanged on the local host
+    middleware.append(Middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_min_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+        exclude_prefixes=("/internal/",),
+    ))
+
+app = Starlette(routes=routes, debug=True, lifespan=lifespan, middleware=middleware)
 
 if __name__ == "__main__":
-    start_server() 
\ No newline at end of file
+    from main import main
+    main(app)
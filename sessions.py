@@ -0,0 +1,272 @@
+from typing import Any, Callable
+import asyncio
+import logging
+import re
+import time
+
+import anyio
+import mcp.types as types
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+from sse_starlette.sse import AppStatus
+from starlette.responses import Response
+from starlette.types import Message, Receive, Scope, Send
+
+logger = logging.getLogger('boltrade_api')
+
+# The transport announces the session's message URL in its first event
+SESSION_ID_RE = re.compile(rb"session_id=([0-9a-f]{32})")
+
+
+class SseSession:
+    """One SSE connection: its limits, its activity and what it holds in memory.
+
+    The MCP server reads and writes through two pumps instead of the
+    transport's streams directly. Outbound messages wait in a queue of at
+    most max_queued; requests beyond max_inflight unanswered ones are
+    refused with an error instead of being started. close() cancels
+    everything the connection runs.
+    """
+
+    def __init__(self, number: int, client: str, max_queued: int, max_inflight: int):
+        self.number = number
+        self.client = client
+        self.max_inflight = max_inflight
+        self.opened_at = self.last_received = self.last_sent = time.monotonic()
+        self.send_pending_since: float | None = None
+        self.queue_full_since: float | None = None
+        self.mcp_session_id: str | None = None
+        self.outbound, self._outbound_reader = anyio.create_memory_object_stream[types.JSONRPCMessage](max_queued)
+        self.transport_writer: MemoryObjectSendStream | None = None
+        self.cancel_scope = anyio.CancelScope()
+        self.close_reason: str | None = None
+        self.response_started = False
+        self.disconnected = False
+        # Subscriptions made over this connection: uri -> server session
+        self.watches: dict[str, Any] = {}
+        self.inflight = 0
+        self.refused = 0
+        self.messages_in = 0
+        self.messages_out = 0
+        self.bytes_sent = 0
+        self.chunks_sent = 0
+
+    @property
+    def queued(self) -> int:
+        return self.outbound.statistics().current_buffer_used
+
+    @property
+    def buffered_bytes(self) -> int:
+        """Estimated bytes held in the outbound queue (queued messages times the average chunk sent)."""
+        return self.queued * (self.bytes_sent // self.chunks_sent if self.chunks_sent else 0)
+
+    def close(self, reason: str) -> None:
+        if self.close_reason is None:
+            self.close_reason = reason
+            self.cancel_scope.cancel()
+
+    def wrap_receive(self, receive: Receive) -> Receive:
+        async def tracked_receive() -> Message:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                self.disconnected = True
+                self.close("disconnected")
+            return message
+
+        return tracked_receive
+
+    def wrap_send(self, send: Send) -> Send:
+        async def tracked_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                self.response_started = True
+            body = message.get("body", b"")
+            if self.mcp_session_id is None:
+                match = SESSION_ID_RE.search(body)
+                if match is not None:
+                    self.mcp_session_id = match.group(1).decode()
+            self.send_pending_since = time.monotonic()
+            await send(message)
+            self.send_pending_since = None
+            self.last_sent = time.monotonic()
+            self.bytes_sent += len(body)
+            self.chunks_sent += 1
+
+        return tracked_send
+
+    async def pump_in(self, source: MemoryObjectReceiveStream, sink: MemoryObjectSendStream) -> None:
+        """Hand client messages to the server, refusing requests over the in-flight limit."""
+        async with sink:
+            async for message in source:
+                self.last_received = time.monotonic()
+                self.messages_in += 1
+                request = getattr(message, "root", None)
+                if isinstance(request, types.JSONRPCRequest):
+                    # Counted down by pump_out when the response (or refusal) goes out
+                    self.inflight += 1
+                    if self.inflight > self.max_inflight:
+                        self.refused += 1
+                        await self.outbound.send(types.JSONRPCMessage(types.JSONRPCError(
+                            jsonrpc="2.0", id=request.id,
+                            error=types.ErrorData(code=-32000, message=(
+                                f"Server busy: {self.max_inflight} requests already in flight on this session")),
+                        )))
+                        continue
+                await sink.send(message)
+
+    async def pump_out(self, sink: MemoryObjectSendStream) -> None:
+        """Forward queued server messages to the transport as fast as the client reads them."""
+        self.transport_writer = sink
+        async with self._outbound_reader:
+            async for message in self._outbound_reader:
+                if isinstance(message.root, (types.JSONRPCResponse, types.JSONRPCError)):
+                    self.inflight = max(self.inflight - 1, 0)
+                self.messages_out += 1
+                await sink.send(message)
+
+    def stats(self, now: float) -> dict[str, Any]:
+        return {
+            "session": self.number,
+            "client": self.client,
+            "age_s": round(now - self.opened_at, 1),
+            "idle_s": round(now - self.last_received, 1),
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "buffered_bytes": self.buffered_bytes,
+            "bytes_sent": self.bytes_sent,
+            "messages_in": self.messages_in,
+            "messages_out": self.messages_out,
+            "refused": self.refused,
+            "watches": len(self.watches),
+        }
+
+
+class SessionRegistry:
+    """Caps concurrent SSE sessions and reaps the ones that stopped being useful.
+
+    Once a second every session is checked, and closed when the server is
+    shutting down or:
+    - its outbound queue has been full for send_timeout seconds (slow consumer);
+    - a write to the client has been pending for heartbeat_timeout seconds, or
+      nothing at all, heartbeat pings included, was written in that time (dead
+      connection);
+    - the SSE response has ended without a disconnect being seen;
+    - no client message arrived for idle_timeout seconds and it is not
+      watching anything (idle). watching(session) says whether it is; by
+      default, whether it ever subscribed to a watch.
+    A timeout of 0 disables that check.
+    """
+
+    def __init__(self, max_sessions: int, max_queued: int, max_inflight: int,
+                 idle_timeout: float, heartbeat_timeout: float, send_timeout: float,
+                 reap_interval: float = 1.0, watching: Callable[[SseSession], bool] | None = None):
+        self.max_sessions = max_sessions
+        self.max_queued = max_queued
+        self.max_inflight = max_inflight
+        self.idle_timeout = idle_timeout
+        self.heartbeat_timeout = heartbeat_timeout
+        self.send_timeout = send_timeout
+        self.reap_interval = reap_interval
+        self.watching = watching or (lambda session: bool(session.watches))
+        self.sessions: dict[int, SseSession] = {}
+        self._numbers = 0
+        self.rejected = 0
+        self.closed: dict[str, int] = {}
+        self._task: asyncio.Task | None = None
+
+    def open(self, client: str) -> SseSession | None:
+        """Register a new session, or return None when max_sessions are already open."""
+        if self.max_sessions and len(self.sessions) >= self.max_sessions:
+            self.rejected += 1
+            return None
+        self._numbers += 1
+        session = SseSession(self._numbers, client, self.max_queued, self.max_inflight)
+        self.sessions[session.number] = session
+        return session
+
+    def remove(self, session: SseSession) -> None:
+        if self.sessions.pop(session.number, None) is not None:
+            reason = session.close_reason or "ended"
+            self.closed[reason] = self.closed.get(reason, 0) + 1
+
+    def check(self, session: SseSession, now: float) -> str | None:
+        """Why session should be reaped now, if it should."""
+        if session.queued >= self.max_queued:
+            session.queue_full_since = session.queue_full_since or now
+            if self.send_timeout and now - session.queue_full_since >= self.send_timeout:
+                return "slow consumer"
+        else:
+            session.queue_full_since = None
+        if self.heartbeat_timeout:
+            if session.send_pending_since is not None and now - session.send_pending_since >= self.heartbeat_timeout:
+                return "unresponsive"
+            if now - session.last_sent >= self.heartbeat_timeout:
+                return "no heartbeat"
+        writer = session.transport_writer
+        if writer is not None and writer.statistics().open_receive_streams == 0:
+            return "stream closed"
+        if self.idle_timeout and now - session.last_received >= self.idle_timeout and not self.watching(session):
+            return "idle"
+        return None
+
+    def reap(self) -> None:
+        now = time.monotonic()
+        for session in list(self.sessions.values()):
+            # Set by the transport's uvicorn exit hook, which does not reliably end open streams itself
+            reason = "shutdown" if AppStatus.should_exit else self.check(session, now)
+            if reason is not None:
+                logger.info(f"Closing SSE session {session.number} ({session.client}): {reason}")
+                session.close(reason)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            self.reap()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        for session in list(self.sessions.values()):
+            session.close("shutdown")
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self, top: int = 10) -> dict[str, Any]:
+        now = time.monotonic()
+        sessions = sorted(self.sessions.values(), key=lambda s: (s.buffered_bytes, s.queued), reverse=True)
+        return {
+            "active": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "rejected": self.rejected,
+            "closed": dict(self.closed),
+            "inflight": sum(s.inflight for s in sessions),
+            "queued": sum(s.queued for s in sessions),
+            "buffered_bytes": sum(s.buffered_bytes for s in sessions),
+            "largest": [s.stats(now) for s in sessions[:top]],
+        }
+
+
+class StreamEnd(Response):
+    """Returned by the SSE endpoint once its session is over.
+
+    Ends the chunked event stream if the client is still connected, so it
+    sees the stream close instead of a stalled connection.
+    """
+
+    def __init__(self, session: SseSession):
+        super().__init__()
+        self.session = session
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.session.disconnected:
+            return
+        if self.session.response_started:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            await Response("Session closed", status_code=503)(scope, receive, send)
@@ -0,0 +1,139 @@
+from typing import Any
+from dataclasses import dataclass, fields
+import functools
+import os
+import types
+
+
+def parse_value(kind: Any, raw: str) -> Any:
+    """Convert an environment string to the field's type; '' is None for optional fields."""
+    if isinstance(kind, types.UnionType):
+        if not raw:
+            return None
+        kind = next(arg for arg in kind.__args__ if arg is not type(None))
+    if kind is bool:
+        return raw.strip().lower() == "true"
+    return kind(raw)
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Server configuration, parsed once from the environment.
+
+    Each field is read from the upper-cased environment variable of the same
+    name (PORT, CACHE_TTL_TOP_SCORE, ...); unset variables keep the default.
+    """
+    host: str = "0.0.0.0"
+    port: int = 3002
+    workers: int = 1
+    # Point at a local stand-in (e.g. mock_upstream.py) for benchmarks
+    upstream_base_url: str = "https://portal.boltrade.ai"
+    # Seconds /ready waits for the upstream pool to warm before reporting ready anyway
+    ready_timeout: float = 30.0
+
+    log_level: str = "INFO"
+    log_dir: str = "logs"
+    log_body_sample_rate: int = 0
+    log_body_max_bytes: int = 2048
+    metrics_enabled: bool = False
+
+    proxy_urls: str = ""
+    proxy_username: str | None = None
+    proxy_password: str | None = None
+    proxy_host: str | None = None
+    proxy_port: str | None = None
+    proxy_balancing: str = "ewma"
+    proxy_eject_after_failures: int = 3
+    proxy_eject_error_rate: float = 0.5
+    proxy_eject_seconds: float = 30.0
+    proxy_probe_interval: float = 10.0
+
+    upstream_max_connections: int = 100
+    upstream_max_keepalive: int = 20
+    upstream_keepalive_expiry: float = 30.0
+    upstream_timeout: float = 10.0
+    upstream_timeout_multiplier: float = 3.0
+    upstream_timeout_min: float = 2.0
+    upstream_max_attempts: int = 3
+    retry_budget_ratio: float = 0.1
+    retry_budget_min_per_second: float = 1.0
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
+
+    rate_limit_key: str = "session"
+    rate_limit_per_second: float = 5.0
+    rate_limit_burst: float = 20.0
+    # Per worker process, like the rate limiter's buckets
+    upstream_concurrency: int = 16
+    upstream_queue_timeout: float = 5.0
+    upstream_queue_per_client: int = 50
+    upstream_background_weight: int = 2
+
+    # Limits per worker process; a timeout of 0 disables that check
+    sse_max_sessions: int = 1000
+    sse_max_queued_messages: int = 64
+    sse_max_inflight: int = 32
+    sse_idle_timeout: float = 1800.0
+    sse_heartbeat_timeout: float = 45.0
+    sse_send_timeout: float = 10.0
+
+    cache_max_entries: int = 256
+    cache_ttl_top_score: float = 30.0
+    cache_ttl_smart_money: float = 15.0
+    cache_max_stale: float = 300.0
+    prefetch_enabled: bool = True
+    prefetch_pages: int = 3
+    prefetch_interval: float = 10.0
+
+    compression_enabled: bool = True
+    compression_min_size: int = 500
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    # Bytes of text a tool result may take (0: unlimited); the list tools can override it
+    result_max_bytes: int = 65536
+    result_max_bytes_top_score: int | None = None
+    result_max_bytes_smart_money: int | None = None
+
+    max_result_limit: int = 100
+    page_fetch_concurrency: int = 4
+    output_precision: int | None = None
+    lookup_max_addresses: int = 50
+    lookup_max_pages: int = 3
+    token_index_max_age: float = 300.0
+    token_index_max_entries: int = 10000
+    query_snapshot_pages: int = 3
+
+    history_enabled: bool = True
+    history_path: str = os.path.join("data", "history.sqlite3")
+    history_flush_interval: float = 5.0
+    history_retention_days: float = 7.0
+    history_downsample_after_hours: float = 24.0
+    history_downsample_bucket_minutes: float = 60.0
+
+    watch_pages: int = 1
+    watch_price_change: float = 0.05
+    watch_score_change: float = 1.0
+    watch_min_rank_move: int = 1
+    # Seconds between polls of a watched list; defaults to the list's cache TTL
+    watch_interval: float | None = None
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        values = {}
+        for field in fields(cls):
+            raw = os.getenv(field.name.upper())
+            if raw is not None:
+                try:
+                    values[field.name] = parse_value(field.type, raw)
+                except ValueError as e:
+                    raise ValueError(f"Invalid {field.name.upper()}={raw!r}: {e}") from None
+        return cls(**values)
+
+
+@functools.cache
+def load_settings() -> Settings:
+    """Read .env (without overriding the environment) and parse the settings, once per process."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return Settings.from_env()
@@ -0,0 +1,52 @@
+from typing import Any
+import os
+import time
+
+
+def process_started() -> float:
+    """time.monotonic() at process start, from /proc on Linux; elsewhere, when this module is imported."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22, counted after the parenthesised command name
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return time.monotonic()
+    return time.monotonic() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+
+# main.py imports this module first, so the fallback misses little more than interpreter startup
+PROCESS_STARTED = process_started()
+
+
+class StartupProfile:
+    """Seconds from process start to each startup stage, in the order reached."""
+
+    def __init__(self, started: float = PROCESS_STARTED):
+        self.started = started
+        self.stages: dict[str, float] = {}
+
+    def mark(self, stage: str) -> None:
+        # The first mark of a stage wins, so re-running a step doesn't move it
+        self.stages.setdefault(stage, round(time.monotonic() - self.started, 4))
+
+    def summary(self) -> str:
+        return ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in self.stages.items())
+
+
+class Readiness:
+    """Whether this process should be sent traffic yet, and why not."""
+
+    def __init__(self):
+        self.ready = False
+        self.detail = "starting"
+
+    def set(self, ready: bool, detail: str) -> None:
+        self.ready = ready
+        self.detail = detail
+
+    def stats(self) -> dict[str, Any]:
+        return {"ready": self.ready, "detail": self.detail}
+
+
+profile = StartupProfile()
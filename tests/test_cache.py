@@ -0,0 +1,107 @@
+import asyncio
+
+from cache import Aged, ResponseCache
+
+
+class Upstream:
+    def __init__(self, values):
+        self.values = list(values)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return self.values.pop(0)
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def run():
+        cache = ResponseCache(default_ttl=60)
+        upstream = Upstream([{"page": 1}])
+        values = await asyncio.gather(*(
+            cache.get_or_fetch("top_score", {"start": 1}, upstream) for _ in range(5)))
+        return values, upstream.calls, cache.stats()
+
+    values, calls, stats = asyncio.run(run())
+    assert values == [{"page": 1}] * 5
+    assert calls == 1
+    assert (stats["misses"], stats["coalesced"]) == (1, 4)
+
+
+def test_keys_are_normalized():
+    async def run():
+        cache = ResponseCache(default_ttl=60)
+        upstream = Upstream([{"page": 1}])
+        await cache.get_or_fetch("top_score", {"start": 1, "limit": 10}, upstream)
+        return await cache.get_or_fetch("top_score", {"limit": "10", "start": "1"}, upstream), upstream.calls
+
+    assert asyncio.run(run()) == ({"page": 1}, 1)
+
+
+def expire(cache, endpoint, params, by=0.0):
+    entry = cache._entries[cache.make_key(endpoint, params)]
+    entry.expires_at = entry.stored_at - by
+
+
+def test_stale_entry_is_served_while_refreshing():
+    async def run():
+        cache = ResponseCache(default_ttl=60, max_stale=300)
+        upstream = Upstream([{"v": 1}, {"v": 2}])
+        await cache.get_or_fetch("top_score", {}, upstream)
+        expire(cache, "top_score", {})
+        stale = await cache.get_entry("top_score", {}, upstream)
+        await asyncio.sleep(0.05)
+        fresh = await cache.get_entry("top_score", {}, upstream)
+        return stale.value, stale.stale, fresh.value, cache.stats()["stale_hits"]
+
+    assert asyncio.run(run()) == ({"v": 1}, True, {"v": 2}, 1)
+
+
+def test_failed_refresh_keeps_last_good_value():
+    async def run():
+        cache = ResponseCache(default_ttl=60, max_stale=300)
+        upstream = Upstream([{"v": 1}, None, None])
+        await cache.get_or_fetch("top_score", {}, upstream)
+        expire(cache, "top_score", {})
+        await cache.get_entry("top_score", {}, upstream)
+        await asyncio.sleep(0.05)
+        refreshed = await cache.refresh("top_score", {}, upstream)
+        return refreshed.value, cache.stats()["refresh_failures"]
+
+    assert asyncio.run(run()) == ({"v": 1}, 2)
+
+
+def test_failures_past_the_stale_window_are_not_cached():
+    async def run():
+        cache = ResponseCache(default_ttl=60, max_stale=300)
+        upstream = Upstream([{"v": 1}, None, {"v": 3}])
+        await cache.get_or_fetch("top_score", {}, upstream)
+        expire(cache, "top_score", {}, by=301)
+        missing = await cache.get_or_fetch("top_score", {}, upstream)
+        fetched = await cache.get_or_fetch("top_score", {}, upstream)
+        return missing, fetched, upstream.calls
+
+    assert asyncio.run(run()) == (None, {"v": 3}, 3)
+
+
+def test_lru_eviction():
+    async def run():
+        cache = ResponseCache(max_entries=2, default_ttl=60)
+        for start in (1, 2, 1, 3):
+            await cache.get_or_fetch("top_score", {"start": start}, Upstream([{"start": start}]))
+        return sorted(key[1] for key in cache._entries), cache.evictions
+
+    assert asyncio.run(run()) == ([(("start", "1"),), (("start", "3"),)], 1)
+
+
+def test_aged_values_expire_early():
+    async def run():
+        cache = ResponseCache(default_ttl=10)
+
+        async def fetch():
+            return Aged({"v": 1}, age=8)
+
+        return await cache.get_entry("top_score", {}, fetch)
+
+    entry = asyncio.run(run())
+    assert 7.9 < entry.age < 9 and not entry.stale
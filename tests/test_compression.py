@@ -0,0 +1,83 @@
+import asyncio
+import zlib
+
+import pytest
+
+import compression
+from compression import CompressionMiddleware, negotiate
+
+
+@pytest.fixture
+def gzip_only(monkeypatch):
+    monkeypatch.setattr(compression, "ENCODINGS", ("gzip",))
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("gzip, deflate", "gzip"),
+    ("", None),
+    ("identity", None),
+    ("gzip;q=0", None),
+    ("*", "gzip"),
+    ("*;q=0.5, gzip;q=0", None),
+    ("GZIP;q=0.8", "gzip"),
+    ("gzip;q=oops", None),
+])
+def test_negotiate_gzip(gzip_only, header, expected):
+    assert negotiate(header) == expected
+
+
+def test_negotiate_prefers_brotli_on_a_tie(monkeypatch):
+    monkeypatch.setattr(compression, "ENCODINGS", ("br", "gzip"))
+    assert negotiate("gzip, br") == "br"
+    assert negotiate("gzip, br;q=0.5") == "gzip"
+
+
+def run_app(parts, content_type="application/json", accept="gzip", path="/", extra_headers=()):
+    """Run an app sending parts as body messages through the middleware; return what went out."""
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", content_type.encode()), *extra_headers]})
+        for index, part in enumerate(parts):
+            await send({"type": "http.response.body", "body": part, "more_body": index < len(parts) - 1})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "path": path, "headers": [(b"accept-encoding", accept.encode())] if accept else []}
+    middleware = CompressionMiddleware(app, minimum_size=100, exclude_prefixes=("/internal/",))
+    asyncio.run(middleware(scope, receive, send))
+    headers = dict(sent[0]["headers"])
+    return headers, [message["body"] for message in sent[1:]]
+
+
+def test_large_bodies_are_gzipped(gzip_only):
+    body = b'{"rows": [' + b'"token",' * 100 + b'"last"]}'
+    headers, bodies = run_app([body])
+    assert headers[b"content-encoding"] == b"gzip" and headers[b"vary"] == b"accept-encoding"
+    assert int(headers[b"content-length"]) == len(bodies[0]) < len(body)
+    assert zlib.decompress(bodies[0], 31) == body
+
+
+def test_small_excluded_and_unaccepted_responses_pass_through(gzip_only):
+    large = b"x" * 1000
+    for kwargs, body in [({}, b"small"), ({"path": "/internal/pages/x"}, large), ({"accept": ""}, large),
+                         ({"extra_headers": [(b"content-encoding", b"br")]}, large)]:
+        headers, bodies = run_app([body], **kwargs)
+        assert headers.get(b"content-encoding") in (None, b"br") and bodies == [body]
+
+
+def test_streams_are_flushed_per_part(gzip_only):
+    events = [b"event: message\r\ndata: {\"n\": %d}\r\n\r\n" % i for i in range(5)]
+    headers, bodies = run_app(events + [b""], content_type="text/event-stream")
+    assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+    decoder = zlib.decompressobj(31)
+    # Each event decodes as soon as its part arrives
+    for event, body in zip(events, bodies):
+        assert decoder.decompress(body) == event
+    decoder.decompress(bodies[-1])
+    assert decoder.eof
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from formats import FORMATS, fit_rows, format_rows
+
+COLUMNS = ["CA address", "symbol", "score", "websites"]
+ROWS = [
+    {"CA address": f"addr{i}", "symbol": f"TKN{i}", "score": 50.123456 + i, "websites": [f"https://t{i}.example"]}
+    for i in range(20)
+]
+
+
+def size(text):
+    return len(text.encode("utf-8"))
+
+
+def test_formats():
+    rows = ROWS[:2]
+    assert json.loads(format_rows(rows, COLUMNS, "json")) == rows
+    columnar = json.loads(format_rows(rows, COLUMNS, "columnar", precision=3))
+    assert columnar["columns"] == COLUMNS and columnar["rows"][1][2] == 51.1
+    assert format_rows(rows, COLUMNS, "csv").splitlines()[1] == 'addr0,TKN0,50.123456,"[""https://t0.example""]"'
+    with pytest.raises(ValueError):
+        format_rows(rows, COLUMNS, "xml")
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_fitting_results_are_untouched(fmt):
+    text, dropped, kept = fit_rows(ROWS, COLUMNS, fmt, None, 100000, ("websites",))
+    assert (text, dropped, kept) == (format_rows(ROWS, COLUMNS, fmt), [], 20)
+    assert fit_rows(ROWS, COLUMNS, fmt, None, 0, ("websites",))[2] == 20
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_fields_are_dropped_before_rows(fmt):
+    without_websites = format_rows([{k: v for k, v in row.items() if k != "websites"} for row in ROWS],
+                                   COLUMNS[:3], fmt)
+    text, dropped, kept = fit_rows(ROWS, COLUMNS, fmt, None, size(without_websites), ("websites", "score"))
+    assert (text, dropped, kept) == (without_websites, ["websites"], 20)
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_rows_are_cut_to_the_largest_count_that_fits(fmt):
+    budget = size(format_rows(ROWS[:7], COLUMNS, fmt)) + 1
+    text, dropped, kept = fit_rows(ROWS, COLUMNS, fmt, None, budget)
+    assert (text, dropped, kept) == (format_rows(ROWS[:7], COLUMNS, fmt), [], 7)
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+@pytest.mark.parametrize("budget", [1, 5, 10, 30, 200])
+def test_results_never_exceed_the_budget(fmt, budget):
+    text, dropped, kept = fit_rows(ROWS, COLUMNS, fmt, 3, budget, ("websites", "score"))
+    assert size(text) <= budget
+    assert kept < 20
+
+
+def test_custom_render():
+    def render(rows, columns):
+        return json.dumps({"tokens": rows, "not_found": ["x"]})
+
+    text, dropped, kept = fit_rows(ROWS, COLUMNS, max_bytes=300, drop_order=("websites",), render=render)
+    result = json.loads(text)
+    assert dropped == ["websites"] and len(result["tokens"]) == kept and result["not_found"] == ["x"]
+    assert "websites" not in result["tokens"][0] and size(text) <= 300
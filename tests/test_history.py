@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from history import METRICS, HistoryStore
+
+NOW = 1_700_000_000
+
+
+def snapshot(address, ts, score, source="top"):
+    values = {metric: None for metric in METRICS}
+    values["score"] = score
+    return (source, address, ts, 1, *values.values())
+
+
+ROWS = [
+    # up 50%, three samples; the middle one does not count
+    snapshot("up", NOW - 3000, 40.0), snapshot("up", NOW - 2000, 90.0), snapshot("up", NOW - 1000, 60.0),
+    # down 25% but the largest absolute change
+    snapshot("down", NOW - 3000, 400.0), snapshot("down", NOW - 1000, 300.0),
+    # unchanged, a single sample, and a row from before the window
+    snapshot("flat", NOW - 3000, 10.0), snapshot("flat", NOW - 1000, 10.0),
+    snapshot("once", NOW - 1000, 5.0),
+    snapshot("old", NOW - 9000, 1.0), snapshot("old", NOW - 1000, 100.0),
+    # another list
+    snapshot("up", NOW - 3000, 1.0, source="smart"), snapshot("up", NOW - 1000, 2.0, source="smart"),
+]
+
+
+def movers(tmp_path, **kwargs):
+    async def run():
+        store = HistoryStore(str(tmp_path / "history.db"))
+        await store.start()
+        store._write(ROWS)
+        try:
+            return await store.movers("top", "score", NOW - 5000, **kwargs)
+        finally:
+            await store.stop()
+
+    return [(mover["address"], mover["from"], mover["to"], mover["samples"]) for mover in asyncio.run(run())]
+
+
+def test_movers(tmp_path):
+    assert movers(tmp_path) == [("up", 40.0, 60.0, 3), ("down", 400.0, 300.0, 2)]
+    assert movers(tmp_path, relative=False) == [("down", 400.0, 300.0, 2), ("up", 40.0, 60.0, 3)]
+    assert movers(tmp_path, direction="down") == [("down", 400.0, 300.0, 2)]
+    assert movers(tmp_path, direction="up", limit=1) == [("up", 40.0, 60.0, 3)]
+
+
+def test_unknown_metric(tmp_path):
+    with pytest.raises(ValueError, match="Unknown metric"):
+        asyncio.run(HistoryStore(str(tmp_path / "history.db")).movers("top", "rank; DROP TABLE", 0))
+
+
+def test_disabled_store_fails_clearly(tmp_path):
+    with pytest.raises(ValueError, match="disabled"):
+        asyncio.run(HistoryStore(str(tmp_path / "history.db")).history("up", 0))
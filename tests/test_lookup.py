@@ -0,0 +1,16 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("addresses", ["So11111111111111111111111111111111111111112", ["a", 1], {"a": 1}])
+def test_addresses_must_be_a_list_of_strings(addresses):
+    with pytest.raises(ValueError, match="list of address strings"):
+        asyncio.run(server.lookup_tokens({"addresses": addresses}))
+
+
+def test_addresses_are_required():
+    with pytest.raises(ValueError, match="required"):
+        asyncio.run(server.lookup_tokens({"addresses": []}))
@@ -0,0 +1,19 @@
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("precision,expected", [(3, 3), ("4", 4), (5.0, 5), (17, 17), (None, None)])
+def test_precision(precision, expected):
+    assert server.result_precision({"precision": precision}) == expected
+
+
+@pytest.mark.parametrize("precision", [0, 18, -1, 2.5, "3.5", "high", True, [3]])
+def test_invalid_precision(precision):
+    with pytest.raises(ValueError, match="precision must be an integer from 1 to 17"):
+        server.result_precision({"precision": precision})
+
+
+def test_precision_defaults_to_the_setting(monkeypatch):
+    monkeypatch.setattr(server, "OUTPUT_PRECISION", 6)
+    assert server.result_precision({}) == 6
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import server
+from cache import CacheEntry
+
+TOOL_NAME = "get-sol-top-score-list"
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """Pages of ten tokens that arrive in reverse order; page 2 repeats two tokens of page 1."""
+    tool = server.FINDGEMS_TOOLS[TOOL_NAME]
+    page_tokens = {start: [{tool.address_key: f"addr{start}-{i}", "symbol": f"T{start}{i}"} for i in range(10)]
+                   for start in range(1, 4)}
+    page_tokens[2][:2] = page_tokens[1][:2]
+    sent = []
+
+    async def fetch_findgems(endpoint, request_data):
+        start = request_data["start"]
+        await asyncio.sleep(0.01 * (4 - start))
+        now = time.monotonic()
+        return CacheEntry({tool.list_key: page_tokens[start]}, now, now + 60)
+
+    async def send(message):
+        sent.append(message)
+
+    monkeypatch.setattr(server, "fetch_findgems", fetch_findgems)
+    monkeypatch.setattr(server, "progress_sender", lambda total: send)
+    return tool, sent
+
+
+def addresses(text):
+    return [row["CA address"] for row in json.loads(text)]
+
+
+def test_progress_holds_only_the_rows_the_result_keeps(pages):
+    tool, sent = pages
+    contents = asyncio.run(server.call_findgems_tool(TOOL_NAME, tool, {"limit": 25, "fields": ["CA address"]}))
+    result = addresses(contents[0].text)
+    assert len(result) == 25 and len(set(result)) == 25
+    assert [len(addresses(message)) for message in sent] == [10, 8, 7]
+    assert sum((addresses(message) for message in sent), []) == result
+
+
+def test_progress_fits_the_byte_budget(pages):
+    tool, sent = pages
+    asyncio.run(server.call_findgems_tool(TOOL_NAME, tool, {"limit": 30, "max_bytes": 200}))
+    assert len(sent) == 3 and all(len(message.encode()) <= 200 for message in sent)
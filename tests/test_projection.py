@@ -0,0 +1,42 @@
+import gc
+import weakref
+
+import pytest
+
+from projection import Projection
+
+FIELDS = [("CA address", "address"), ("symbol", "symbol"), ("score", "score_v2")]
+TOKEN = {"address": "addr1", "symbol": "AAA", "score_v2": 91, "extra": True}
+
+
+def test_row_maps_source_keys_and_fills_missing():
+    projection = Projection(FIELDS)
+    assert projection.row(TOKEN) == {"CA address": "addr1", "symbol": "AAA", "score": 91}
+    assert projection([{"symbol": "BBB"}]) == [{"CA address": None, "symbol": "BBB", "score": None}]
+
+
+def test_select_keeps_declaration_order_and_is_reused():
+    projection = Projection(FIELDS)
+    selected = projection.select(["score", "CA address"])
+    assert selected.output_keys == ["CA address", "score"]
+    assert projection.select(["CA address", "score", "score"]) is selected
+    assert projection.select(None) is projection and projection.select([]) is projection
+
+
+@pytest.mark.parametrize("names,message", [
+    (["volume"], "Unknown fields: volume"),
+    ("symbol", "must be a list"),
+    (["symbol", 3], "must be a list"),
+])
+def test_select_errors(names, message):
+    with pytest.raises(ValueError, match=message):
+        Projection(FIELDS).select(names)
+
+
+def test_selections_do_not_keep_the_projection_alive():
+    projection = Projection(FIELDS)
+    projection.select(["symbol"])
+    ref = weakref.ref(projection)
+    del projection
+    gc.collect()
+    assert ref() is None
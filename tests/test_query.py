@@ -0,0 +1,124 @@
+import math
+
+import pytest
+
+import query
+from query import Condition, QueryError, Snapshot, parse_filter, parse_sort, to_seconds
+
+FIELDS = ["score", "liquidity_usd", "symbol", "token_age"]
+
+ROWS = [
+    {"score": 90, "liquidity_usd": 120000, "symbol": "AAA", "token_age": "2d 4h"},
+    {"score": 75, "liquidity_usd": 40000, "symbol": "BBB", "token_age": "3h"},
+    {"score": 60, "liquidity_usd": None, "symbol": "CCC", "token_age": "15m"},
+    {"score": "n/a", "liquidity_usd": 800000, "symbol": "DDD", "token_age": "7d"},
+    {"score": 75, "liquidity_usd": 65000, "symbol": None, "token_age": None},
+    {"score": 88.5, "liquidity_usd": 15000, "symbol": "AAA", "token_age": "45min"},
+]
+
+
+def test_and_binds_tighter_than_or():
+    groups = parse_filter("score > 80 and liquidity_usd > 50k or symbol == CCC", FIELDS)
+    assert groups == [
+        [Condition("score", ">", 80.0), Condition("liquidity_usd", ">", 50000.0)],
+        [Condition("symbol", "==", "CCC")],
+    ]
+
+
+def test_literals():
+    groups = parse_filter("token_age < 2h and symbol = 'A B' and liquidity_usd >= 1.5m", FIELDS)
+    assert groups == [[
+        Condition("token_age", "<", 7200.0, duration=True),
+        Condition("symbol", "==", "A B"),
+        Condition("liquidity_usd", ">=", 1.5e6),
+    ]]
+
+
+def test_empty_filter_matches_everything():
+    assert parse_filter(None, FIELDS) == []
+    assert parse_filter("   ", FIELDS) == []
+
+
+@pytest.mark.parametrize("expr", [
+    "score >",
+    "score > 1 and",
+    "volume > 1",
+    "score => 1",
+    "score > 1 xor liquidity_usd > 2",
+    "symbol > abc",
+    "score > 5q",
+    "score > 1 !",
+])
+def test_filter_errors(expr):
+    with pytest.raises(QueryError):
+        parse_filter(expr, FIELDS)
+
+
+def test_parse_sort():
+    assert parse_sort("score desc, liquidity_usd", FIELDS) == [("score", True), ("liquidity_usd", False)]
+    with pytest.raises(QueryError):
+        parse_sort("volume", FIELDS)
+    with pytest.raises(QueryError):
+        parse_sort("score up", FIELDS)
+
+
+def test_to_seconds():
+    assert to_seconds("2d 4h") == 2 * 86400 + 4 * 3600
+    assert to_seconds("15m") == 900
+    assert math.isnan(to_seconds("soon"))
+    assert math.isnan(to_seconds(None))
+
+
+QUERIES = [
+    (None, None),
+    ("score > 70", None),
+    ("score != 75", "score"),
+    ("liquidity_usd < 100k or symbol == AAA", "liquidity_usd desc"),
+    ("token_age <= 1d", "token_age"),
+    ("symbol == AAA and score >= 88.5", None),
+    (None, "symbol, score desc"),
+    (None, "score desc, liquidity_usd"),
+]
+
+
+@pytest.fixture
+def without_numpy(monkeypatch):
+    monkeypatch.setattr(query, "np", None)
+    monkeypatch.setattr(query, "_numpy_checked", True)
+
+
+def symbols(rows):
+    return [(row["symbol"], row["score"]) for row in rows]
+
+
+@pytest.mark.parametrize("filter_expr,sort_expr", QUERIES)
+def test_numpy_and_lists_agree(filter_expr, sort_expr, monkeypatch):
+    pytest.importorskip("numpy")
+    with_numpy = Snapshot(ROWS, FIELDS).query(filter_expr, sort_expr, limit=10)[0]
+    assert query.np is not None
+    monkeypatch.setattr(query, "np", None)
+    monkeypatch.setattr(query, "_numpy_checked", True)
+    with_lists = Snapshot(ROWS, FIELDS).query(filter_expr, sort_expr, limit=10)[0]
+    assert symbols(with_numpy) == symbols(with_lists)
+
+
+def test_missing_values_never_match(without_numpy):
+    snapshot = Snapshot(ROWS, FIELDS)
+    assert [row["symbol"] for row in snapshot.query("liquidity_usd != 1")[0]] == ["AAA", "BBB", "DDD", None, "AAA"]
+
+
+def test_sort_puts_missing_values_last(without_numpy):
+    rows, _ = Snapshot(ROWS, FIELDS).query(sort_expr="score desc")
+    assert [row["score"] for row in rows] == [90, 88.5, 75, 75, 60, "n/a"]
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_limit_keeps_the_match_count(numpy, monkeypatch):
+    if numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(query, "np", None)
+        monkeypatch.setattr(query, "_numpy_checked", True)
+    rows, matched = Snapshot(ROWS, FIELDS).query("score > 70", "score desc", limit=2)
+    assert [row["score"] for row in rows] == [90, 88.5]
+    assert matched == 4
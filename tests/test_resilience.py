@@ -0,0 +1,82 @@
+import resilience
+from resilience import CircuitBreaker, RetryBudget
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def patch_clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(monkeypatch):
+    clock = patch_clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    clock.now += 10
+    assert breaker.retry_after() == 20
+
+
+def test_half_open_lets_a_single_probe_through(monkeypatch):
+    clock = patch_clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request() and breaker.allow_request()
+
+
+def test_failed_probe_reopens(monkeypatch):
+    clock = patch_clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    clock.now += 30
+    assert breaker.allow_request()
+
+
+def test_abandoned_probe_can_be_released(monkeypatch):
+    clock = patch_clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+
+def test_retry_budget(monkeypatch):
+    clock = patch_clock(monkeypatch)
+    budget = RetryBudget(ratio=0.5, min_per_second=1.0, max_balance=2.0)
+    assert budget.try_withdraw() and budget.try_withdraw()
+    assert not budget.try_withdraw()
+    assert budget.exhausted == 1
+    budget.deposit()
+    budget.deposit()
+    assert budget.try_withdraw()
+    clock.now += 1.5
+    assert budget.try_withdraw()
+    assert not budget.try_withdraw()
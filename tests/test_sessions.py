@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+from sessions import SessionRegistry
+
+
+def idle_registry(**kwargs):
+    return SessionRegistry(max_sessions=2, max_queued=4, max_inflight=2, idle_timeout=10,
+                           heartbeat_timeout=0, send_timeout=0, **kwargs)
+
+
+def test_idle_sessions_are_reaped_unless_watching():
+    asyncio.run(idle_check())
+
+
+async def idle_check():
+    subscribed = set()
+    registry = idle_registry(watching=lambda session: session.number in subscribed)
+    session = registry.open("a")
+    session.watches["boltrade://watch/list"] = object()
+    later = time.monotonic() + 11
+    assert registry.check(session, later) == "idle"
+    subscribed.add(session.number)
+    assert registry.check(session, later) is None
+    assert registry.check(session, time.monotonic()) is None
+
+
+def test_session_cap_and_close_reasons():
+    asyncio.run(cap_and_close())
+
+
+async def cap_and_close():
+    registry = idle_registry()
+    first, second = registry.open("a"), registry.open("b")
+    assert registry.open("c") is None and registry.rejected == 1
+    first.close("idle")
+    registry.remove(first)
+    registry.remove(second)
+    assert registry.stats()["closed"] == {"idle": 1, "ended": 1}
+    assert registry.open("c") is not None
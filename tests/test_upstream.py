@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+import server
+from cache import ResponseCache
+from resilience import CircuitBreaker
+from scheduling import FairScheduler
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """One upstream slot and a fake request_once that records the pages it fetches."""
+    scheduler = FairScheduler(max_concurrency=1, max_wait=5)
+    fetched = []
+
+    async def request_once(url, endpoint, guard):
+        fetched.append(int(url.split("start=")[1].split("&")[0]))
+        await asyncio.sleep(0.01)
+        return {"users": []}, False
+
+    monkeypatch.setattr(server, "upstream_scheduler", scheduler)
+    monkeypatch.setattr(server, "upstream_pool", object())
+    monkeypatch.setattr(server, "upstream_guards", {})
+    monkeypatch.setattr(server, "response_cache", ResponseCache(default_ttl=60))
+    monkeypatch.setattr(server, "request_once", request_once)
+    return scheduler, fetched
+
+
+async def fetch_page(client, start):
+    server.current_client.set(client)
+    return await server.fetch_findgems(
+        "top_score", {"limit": 10, "start": start, "chain": "solana", "frame": "30d"})
+
+
+def test_shared_fetch_is_not_stuck_behind_the_first_clients_backlog(upstream):
+    scheduler, fetched = upstream
+
+    async def run():
+        flood = [asyncio.create_task(fetch_page("flood", start)) for start in range(1, 7)]
+        # The flooding client starts the fetch of page 100, then a quiet client asks for it too
+        shared = [asyncio.create_task(fetch_page("flood", 100)), asyncio.create_task(fetch_page("quiet", 100))]
+        entries = await asyncio.gather(*flood, *shared)
+        return entries, server.fetch_waiters, server.queued_fetches
+
+    entries, waiters, queued = asyncio.run(run())
+    assert all(entry is not None for entry in entries)
+    assert fetched.count(100) == 1
+    # Granted on the quiet client's turn: right after the flooding client's next page
+    assert fetched[:3] == [1, 2, 100]
+    assert waiters == {} and queued == {} and scheduler.active == 0
+
+
+def test_revalidation_nobody_waits_on_queues_as_background(upstream, monkeypatch):
+    scheduler, fetched = upstream
+    queued_as = []
+    acquire = scheduler.acquire
+
+    async def recording_acquire(client, weight=1, request=None):
+        queued_as.append(client)
+        await acquire(client, weight, request)
+
+    monkeypatch.setattr(scheduler, "acquire", recording_acquire)
+    server.response_cache.max_stale = 300
+
+    async def run():
+        await fetch_page("a", 1)
+        server.response_cache._entries[next(iter(server.response_cache._entries))].expires_at = time.monotonic()
+        entry = await fetch_page("a", 1)
+        assert entry.stale
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert queued_as == ["a", server.BACKGROUND_CLIENT]
+
+
+def test_open_circuit_fails_fast_without_queueing(upstream):
+    scheduler, fetched = upstream
+
+    async def run():
+        breaker = server.upstream_guard("top_score").breaker
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        # Every slot is busy: a request that queued would wait max_wait and be shed
+        await scheduler.acquire("holder")
+        return await asyncio.wait_for(server.make_boltrade_request(server.findgems_url(
+            "top_score", {"limit": 10, "start": 1, "chain": "solana", "frame": "30d"})), 1)
+
+    assert asyncio.run(run()) is None
+    assert fetched == [] and scheduler.queued == 0 and scheduler.shed == 0
@@ -0,0 +1,47 @@
+from watch import Threshold, diff_rows
+
+THRESHOLDS = [Threshold("price", 0.05, relative=True), Threshold("score", 1.0)]
+
+
+def row(address, price=1.0, score=50.0):
+    return {"CA address": address, "price": price, "score": score}
+
+
+def diff(previous, current, min_rank_move=1):
+    return diff_rows(previous, current, "CA address", THRESHOLDS, min_rank_move)
+
+
+def test_unchanged_lists_have_no_changes():
+    rows = [row("a"), row("b")]
+    assert diff(rows, [dict(r) for r in rows]) == {}
+
+
+def test_added_and_removed():
+    changes = diff([row("a"), row("b")], [row("a"), row("c")])
+    assert changes == {"added": [dict(row("c"), rank=2)], "removed": ["b"]}
+
+
+def test_rank_moves_respect_the_minimum():
+    previous = [row("a"), row("b"), row("c")]
+    current = [row("b"), row("a"), row("c")]
+    assert diff(previous, current)["moved"] == [
+        {"CA address": "b", "from": 2, "to": 1},
+        {"CA address": "a", "from": 1, "to": 2},
+    ]
+    assert diff(previous, current, min_rank_move=2) == {}
+
+
+def test_field_changes_beyond_their_threshold():
+    changes = diff([row("a", price=1.0, score=50), row("b", price=2.0, score=10)],
+                   [row("a", price=1.04, score=51), row("b", price=2.2, score=10.5)])
+    assert changes == {"changed": [
+        {"CA address": "a", "field": "score", "old": 50, "new": 51},
+        {"CA address": "b", "field": "price", "old": 2.0, "new": 2.2},
+    ]}
+
+
+def test_threshold_edge_cases():
+    relative = Threshold("price", 0.05, relative=True)
+    assert relative.exceeded(0, 1) and not relative.exceeded(0, 0)
+    assert not relative.exceeded(None, 1.0) and not relative.exceeded(1.0, None)
+    assert Threshold("risk", 0).exceeded("low", "high")
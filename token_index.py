@@ -0,0 +1,66 @@
+from typing import Any, Iterable
+from collections import OrderedDict
+from dataclasses import dataclass
+import time
+
+
+@dataclass
+class IndexedToken:
+    token: dict[str, Any]
+    source: str
+    updated_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.updated_at
+
+
+class TokenIndex:
+    """In-memory index of every token seen in upstream pages, keyed by address.
+
+    A token can appear in several lists, so each address keeps the latest
+    record per source. Addresses are evicted least-recently-updated once
+    max_entries is reached.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, dict[str, IndexedToken]] = OrderedDict()
+        # Bumped on every change so derived snapshots know when to rebuild
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, source: str, tokens: Iterable[dict[str, Any]], address_key: str) -> int:
+        """Index a page of tokens, returning how many carried an address."""
+        now = time.time()
+        added = 0
+        for token in tokens:
+            address = token.get(address_key)
+            if not address:
+                continue
+            self._entries.setdefault(address, {})[source] = IndexedToken(token, source, now)
+            self._entries.move_to_end(address)
+            added += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self.version += 1
+        return added
+
+    def get(self, address: str, max_age: float | None = None) -> list[IndexedToken]:
+        """Records for address, newest first, skipping those older than max_age."""
+        records = self._entries.get(address, {}).values()
+        if max_age is not None:
+            records = [record for record in records if record.age <= max_age]
+        return sorted(records, key=lambda record: record.updated_at, reverse=True)
+
+    def records(self, source: str, max_age: float | None = None) -> list[IndexedToken]:
+        """Latest record of every address seen in source, skipping those older than max_age."""
+        records = [by_source[source] for by_source in self._entries.values() if source in by_source]
+        if max_age is not None:
+            records = [record for record in records if record.age <= max_age]
+        return records
+
+    def stats(self) -> dict[str, Any]:
+        return {"addresses": len(self._entries), "max_entries": self.max_entries}
@@ -0,0 +1,147 @@
+from typing import Any, Awaitable, Callable
+from dataclasses import dataclass
+import asyncio
+import logging
+
+logger = logging.getLogger('boltrade_api')
+
+
+@dataclass(frozen=True)
+class Threshold:
+    """Smallest change of a numeric field worth pushing (a fraction if relative)."""
+    field: str
+    min_change: float
+    relative: bool = False
+
+    def exceeded(self, old: Any, new: Any) -> bool:
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+            return old != new and old is not None and new is not None
+        if self.relative:
+            if old == 0:
+                return new != 0
+            return abs(new - old) / abs(old) >= self.min_change
+        return abs(new - old) >= self.min_change
+
+
+def diff_rows(previous: list[dict[str, Any]], current: list[dict[str, Any]], key: str,
+              thresholds: list[Threshold], min_rank_move: int = 1) -> dict[str, list]:
+    """Changes between two ranked snapshots of projected rows, keyed on key.
+
+    Returns only the non-empty groups of: added rows (with their rank),
+    removed keys, rank moves of at least min_rank_move, and field changes
+    beyond their threshold.
+    """
+    before = {row.get(key): (rank, row) for rank, row in enumerate(previous, 1)}
+    after = {row.get(key): (rank, row) for rank, row in enumerate(current, 1)}
+    changes: dict[str, list] = {"added": [], "removed": [], "moved": [], "changed": []}
+    for address, (rank, row) in after.items():
+        if address not in before:
+            changes["added"].append(dict(row, rank=rank))
+            continue
+        old_rank, old_row = before[address]
+        if abs(rank - old_rank) >= min_rank_move:
+            changes["moved"].append({key: address, "from": old_rank, "to": rank})
+        for threshold in thresholds:
+            old, new = old_row.get(threshold.field), row.get(threshold.field)
+            if threshold.exceeded(old, new):
+                changes["changed"].append({key: address, "field": threshold.field, "old": old, "new": new})
+    changes["removed"] = [address for address in before if address not in after]
+    return {group: items for group, items in changes.items() if items}
+
+
+class Watch:
+    """One watched list: its subscribers and the last snapshot pushed to them."""
+
+    def __init__(self, uri: str):
+        self.uri = uri
+        self.subscribers: set[Any] = set()
+        self.snapshot: list[dict[str, Any]] | None = None
+        self.task: asyncio.Task | None = None
+        self.polls = 0
+        self.pushes = 0
+
+
+class WatchHub:
+    """Polls each watched list once, centrally, and pushes diffs to its subscribers.
+
+    A list is polled only while it has subscribers. load(uri) returns the
+    current rows (or None on failure), diff(uri, previous, current) the
+    changes, and send(subscriber, uri, changes) delivers them; a subscriber
+    whose send fails is dropped.
+    """
+
+    def __init__(self, load: Callable[[str], Awaitable[list[dict[str, Any]] | None]],
+                 diff: Callable[[str, list, list], dict[str, list]],
+                 send: Callable[[Any, str, dict[str, list]], Awaitable[None]],
+                 interval: Callable[[str], float]):
+        self.load = load
+        self.diff = diff
+        self.send = send
+        self.interval = interval
+        self.watches: dict[str, Watch] = {}
+
+    def subscribe(self, uri: str, subscriber: Any) -> None:
+        watch = self.watches.get(uri)
+        if watch is None:
+            watch = self.watches[uri] = Watch(uri)
+        watch.subscribers.add(subscriber)
+        if watch.task is None or watch.task.done():
+            watch.task = asyncio.create_task(self.run(watch))
+            logger.info(f"Watching {uri}")
+
+    def unsubscribe(self, uri: str, subscriber: Any) -> None:
+        watch = self.watches.get(uri)
+        if watch is not None:
+            watch.subscribers.discard(subscriber)
+
+    def is_subscribed(self, uri: str, subscriber: Any) -> bool:
+        watch = self.watches.get(uri)
+        return watch is not None and subscriber in watch.subscribers
+
+    async def poll(self, watch: Watch) -> None:
+        rows = await self.load(watch.uri)
+        watch.polls += 1
+        if rows is None:
+            return
+        previous, watch.snapshot = watch.snapshot, rows
+        if previous is None:
+            return
+        changes = self.diff(watch.uri, previous, rows)
+        if not changes:
+            return
+        watch.pushes += 1
+        subscribers = list(watch.subscribers)
+        results = await asyncio.gather(
+            *(self.send(subscriber, watch.uri, changes) for subscriber in subscribers),
+            return_exceptions=True,
+        )
+        for subscriber, result in zip(subscribers, results):
+            if isinstance(result, Exception):
+                logger.info(f"Dropping {watch.uri} subscriber: {type(result).__name__}")
+                watch.subscribers.discard(subscriber)
+
+    async def run(self, watch: Watch) -> None:
+        try:
+            while watch.subscribers:
+                try:
+                    await self.poll(watch)
+                except Exception as e:
+                    logger.error(f"Watch poll error for {watch.uri}: {type(e).__name__}: {e}")
+                await asyncio.sleep(self.interval(watch.uri))
+        finally:
+            # Start from a fresh baseline if the list is watched again later
+            watch.snapshot = None
+            logger.info(f"Stopped watching {watch.uri}")
+
+    async def stop(self) -> None:
+        tasks = [watch.task for watch in self.watches.values() if watch.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.watches.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            uri: {"subscribers": len(watch.subscribers), "polls": watch.polls, "pushes": watch.pushes}
+            for uri, watch in self.watches.items()
+        }
@@ -0,0 +1,148 @@
+from typing import Any
+from dataclasses import dataclass
+import logging
+import os
+import re
+import secrets
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+logger = logging.getLogger('boltrade_api')
+
+# Set by the supervisor for each worker process it starts
+WORKER_ID_ENV = "BOLTRADE_WORKER_ID"
+WORKER_COUNT_ENV = "BOLTRADE_WORKER_COUNT"
+SOCKET_DIR_ENV = "BOLTRADE_WORKER_SOCKET_DIR"
+PEER_TOKEN_ENV = "BOLTRADE_PEER_TOKEN"
+LISTEN_FD_ENV = "BOLTRADE_LISTEN_FD"
+
+
+@dataclass(frozen=True)
+class WorkerTopology:
+    """Which worker this process is, out of how many, and how to reach the others.
+
+    Each worker serves the shared public socket and a private Unix socket in
+    socket_dir. SSE sessions are pinned to the worker that opened them by
+    putting its index in the message path (/messages/<index>/), and every
+    cache key has one owner worker, chosen by a stable hash.
+    """
+    index: int = 0
+    count: int = 1
+    socket_dir: str | None = None
+    peer_token: str | None = None
+
+    @classmethod
+    def from_env(cls) -> "WorkerTopology":
+        if WORKER_ID_ENV not in os.environ:
+            return cls()
+        return cls(
+            index=int(os.environ[WORKER_ID_ENV]),
+            count=int(os.environ[WORKER_COUNT_ENV]),
+            socket_dir=os.environ[SOCKET_DIR_ENV],
+            peer_token=os.environ[PEER_TOKEN_ENV],
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.count > 1
+
+    @property
+    def messages_path(self) -> str:
+        return f"/messages/{self.index}/" if self.enabled else "/messages/"
+
+    def socket_path(self, index: int) -> str:
+        return os.path.join(self.socket_dir, f"worker-{index}.sock")
+
+    def owner(self, key: Any) -> int:
+        # crc32 rather than hash(): it must agree across processes
+        return zlib.crc32(repr(key).encode("utf-8")) % self.count if self.enabled else self.index
+
+    def owns(self, key: Any) -> bool:
+        return self.owner(key) == self.index
+
+    def message_owner(self, path: str) -> int | None:
+        """Worker index encoded in a /messages/<index>/ path, if any."""
+        match = re.match(r"^/messages/(\d+)/", path)
+        if match is None:
+            return None
+        index = int(match.group(1))
+        return index if index < self.count else None
+
+
+def serve_worker(app: Any, topology: WorkerTopology, log_level: str = "info") -> None:
+    """Run app on the inherited public socket plus this worker's private socket."""
+    import uvicorn
+
+    public = socket.socket(fileno=int(os.environ[LISTEN_FD_ENV]))
+    private_path = topology.socket_path(topology.index)
+    if os.path.exists(private_path):
+        os.unlink(private_path)
+    private = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    private.bind(private_path)
+    private.listen(128)
+    config = uvicorn.Config(app, log_level=log_level, timeout_graceful_shutdown=5)
+    uvicorn.Server(config).run(sockets=[public, private])
+
+
+def run_supervisor(script: str, host: str, port: int, workers: int) -> None:
+    """Bind the public socket once and keep that many worker processes serving it.
+
+    Each worker is a fresh interpreter running script with the WORKER_*
+    environment set. A worker that exits unexpectedly is restarted with the
+    same index, so its private socket path stays valid for its peers.
+    """
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(2048)
+    listener.set_inheritable(True)
+
+    socket_dir = tempfile.mkdtemp(prefix="boltrade-workers-")
+    base_env = dict(os.environ, **{
+        WORKER_COUNT_ENV: str(workers),
+        SOCKET_DIR_ENV: socket_dir,
+        PEER_TOKEN_ENV: secrets.token_hex(16),
+        LISTEN_FD_ENV: str(listener.fileno()),
+    })
+
+    def spawn(index: int) -> subprocess.Popen:
+        env = dict(base_env, **{WORKER_ID_ENV: str(index)})
+        return subprocess.Popen([sys.executable, script], env=env, pass_fds=(listener.fileno(),))
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info(f"Starting {workers} workers on {host}:{port} (peer sockets in {socket_dir})")
+    processes = {index: spawn(index) for index in range(workers)}
+    try:
+        while not stopping:
+            for index, process in list(processes.items()):
+                if process.poll() is not None:
+                    logger.warning(f"Worker {index} exited with {process.returncode}; restarting")
+                    processes[index] = spawn(index)
+            time.sleep(0.5)
+    finally:
+        logger.info("Stopping workers")
+        for process in processes.values():
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        deadline = time.monotonic() + 10
+        for process in processes.values():
+            try:
+                process.wait(timeout=max(deadline - time.monotonic(), 0.1))
+            except subprocess.TimeoutExpired:
+                process.kill()
+        listener.close()
+        shutil.rmtree(socket_dir, ignore_errors=True)